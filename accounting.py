@@ -0,0 +1,444 @@
+import pathlib
+import sqlite3
+
+import instrument
+import render
+import reports
+import schema
+from dates import from_date_code, optional_date_code, to_date_code
+from money import from_cents, to_cents
+from unitofwork import configure, transaction
+
+
+# Headless accounting engine used by the Tk GUI in ss.py, batch jobs and
+# scripts. Nothing in here imports tkinter, so it can be used without a display.
+
+DEFAULT_DB_PATH = 'chart_of_accounts.db'
+
+ACCOUNT_TYPES = ['Asset', 'Liability', 'Equity', 'Income', 'Expense']
+
+
+def connect(db_path=DEFAULT_DB_PATH, wal=True, synchronous='FULL', check_same_thread=True):
+    conn = sqlite3.connect(db_path, factory=instrument.Connection, check_same_thread=check_same_thread)
+    configure(conn, wal, synchronous)
+    schema.migrate(conn)
+    return conn
+
+
+def connect_read_only(db_path, check_same_thread=True):
+    # For readers that must not change the file, e.g. consolidation workers.
+    # The schema cannot be migrated read-only, so it has to be current already.
+    conn = sqlite3.connect(pathlib.Path(db_path).resolve().as_uri() + '?mode=ro', uri=True,
+                           check_same_thread=check_same_thread, factory=instrument.Connection)
+    version = schema.schema_version(conn)
+    if version != len(schema.MIGRATIONS):
+        conn.close()
+        raise RuntimeError(f"{db_path} has schema version {version}, open it with connect() once to upgrade it")
+    return conn
+
+
+# Accounts
+
+# Amounts are stored in cents and dates as YYYYMMDD codes; rows handed out for
+# display carry Decimals and ISO date strings
+def account_row(row):
+    return row[:3] + (from_cents(row[3]), from_date_code(row[4])) + row[5:]
+
+
+def journal_row(row):
+    return (row[0], from_date_code(row[1]), row[2], from_cents(row[3]), from_cents(row[4])) + row[5:]
+
+
+def get_accounts(conn):
+    return [account_row(row) for row in conn.execute("SELECT id, name, type, balance, created_date FROM accounts")]
+
+
+ACCOUNTS_PAGE_SIZE = 200
+
+
+def get_accounts_page(conn, after_id=None, before_id=None, limit=ACCOUNTS_PAGE_SIZE):
+    # Keyset pagination on accounts.id, like get_journal_page
+    query = "SELECT id, name, type, balance, created_date FROM accounts"
+    if before_id is not None:
+        rows = conn.execute(query + " WHERE id < ? ORDER BY id DESC LIMIT ?", (before_id, limit)).fetchall()
+        rows.reverse()
+    elif after_id is not None:
+        rows = conn.execute(query + " WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+    else:
+        rows = conn.execute(query + " ORDER BY id LIMIT ?", (limit,)).fetchall()
+    return [account_row(row) for row in rows]
+
+
+SEARCH_LIMIT = 50
+
+
+def search_accounts(conn, search_text, limit=None):
+    # Substring search on account names, best matches first. The trigram index
+    # needs at least three characters; shorter text falls back to LIKE.
+    limit = -1 if limit is None else limit
+    if len(search_text) >= 3 and schema.has_table(conn, 'accounts_fts'):
+        rows = conn.execute('''SELECT a.id, a.name, a.type, a.balance, a.created_date FROM accounts_fts AS f
+                               INNER JOIN accounts AS a ON a.id = f.rowid
+                               WHERE accounts_fts MATCH ?
+                               ORDER BY f.rank LIMIT ?''', ('"' + search_text.replace('"', '""') + '"', limit))
+    else:
+        rows = conn.execute("SELECT id, name, type, balance, created_date FROM accounts WHERE name LIKE ? LIMIT ?",
+                            ('%' + search_text + '%', limit))
+    return [account_row(row) for row in rows]
+
+
+def parse_amount(value, field='amount'):
+    try:
+        return to_cents(value)
+    except ValueError:
+        raise ValueError(f"Invalid {field}")
+
+
+def add_account(conn, name, account_type, balance, created_date):
+    balance = parse_amount(balance, 'balance')
+    created_date = to_date_code(created_date)
+    with transaction(conn):
+        cur = conn.execute("INSERT INTO accounts (name, type, balance, opening_balance, created_date) "
+                           "VALUES (?, ?, ?, ?, ?)", (name, account_type, balance, balance, created_date))
+    return cur.lastrowid
+
+
+def update_account(conn, account_id, name, account_type, created_date):
+    # The balance is left alone: it follows the journal, and a balance
+    # written over it is exactly what integrity.py has to be able to catch
+    created_date = to_date_code(created_date)
+    with transaction(conn):
+        conn.execute("UPDATE accounts SET name=?, type=?, created_date=? WHERE id=?",
+                     (name, account_type, created_date, account_id))
+
+
+def adjust_balance(conn, account_id, balance):
+    # A deliberate manual adjustment: the difference to the current balance
+    # goes into the opening balance, so the journal still explains the rest
+    balance = parse_amount(balance, 'balance')
+    with transaction(conn):
+        conn.execute("UPDATE accounts SET opening_balance = opening_balance + ? - balance, balance=? WHERE id=?",
+                     (balance, balance, account_id))
+
+
+def delete_account(conn, account_id):
+    with transaction(conn):
+        conn.execute("DELETE FROM accounts WHERE id=?", (account_id,))
+
+
+# Journal
+
+def add_journal_entry(conn, date, account_id, debit, credit):
+    if not (account_id and debit and credit):
+        raise ValueError("Please fill all fields")
+
+    try:
+        debit = to_cents(debit)
+        credit = to_cents(credit)
+    except ValueError:
+        raise ValueError("Invalid debit or credit amount")
+
+    if debit <= 0 or credit <= 0:
+        raise ValueError("Debit and Credit should be greater than zero")
+    date = to_date_code(date)
+
+    # The entry and the balance change are committed together or not at all
+    with transaction(conn):
+        check_open_period(conn, date)
+
+        # Update the journal entries
+        cur = conn.execute("INSERT INTO journal_entries (date, account_id, debit, credit) VALUES (?, ?, ?, ?)",
+                           (date, account_id, debit, credit))
+
+        # Update the account balances
+        conn.execute("UPDATE accounts SET balance = balance + ? WHERE id = ?", (debit - credit, account_id))
+    return cur.lastrowid
+
+
+def delete_journal_entry(conn, journal_entry_id):
+    with transaction(conn):
+        row = conn.execute("SELECT date, voucher_id FROM journal_entries WHERE id=?", (journal_entry_id,)).fetchone()
+        if row:
+            check_open_period(conn, row[0])
+            # Removing one line would leave the voucher unbalanced
+            if row[1] is not None:
+                raise ValueError(f"Entry belongs to voucher {row[1]}, delete the voucher instead")
+        # Reverse the entry's balance change along with it
+        conn.execute('''UPDATE accounts SET balance = balance - (SELECT debit - credit FROM journal_entries WHERE id=?)
+                        WHERE id = (SELECT account_id FROM journal_entries WHERE id=?)''',
+                     (journal_entry_id, journal_entry_id))
+        conn.execute("DELETE FROM journal_entries WHERE id=?", (journal_entry_id,))
+
+
+# Vouchers
+
+def voucher_lines(lines):
+    # Validates (account_id, debit, credit) lines, returns them in cents
+    if len(lines) < 2:
+        raise ValueError("A voucher needs at least two lines")
+    parsed = []
+    for account_id, debit, credit in lines:
+        if not account_id:
+            raise ValueError("Please select an account for every line")
+        try:
+            debit = to_cents(debit or 0)
+            credit = to_cents(credit or 0)
+        except ValueError:
+            raise ValueError("Invalid debit or credit amount")
+        if debit < 0 or credit < 0:
+            raise ValueError("Debit and Credit cannot be negative")
+        if debit == 0 and credit == 0:
+            raise ValueError("Every line needs a debit or a credit")
+        parsed.append((int(account_id), debit, credit))
+
+    total_debit = sum(line[1] for line in parsed)
+    total_credit = sum(line[2] for line in parsed)
+    if total_debit != total_credit:
+        raise ValueError(f"Debits ({from_cents(total_debit)}) do not equal credits ({from_cents(total_credit)})")
+    return parsed
+
+
+def post_voucher(conn, date, lines, memo=''):
+    # Posts a balanced transaction of (account_id, debit, credit) lines: the
+    # header, every line and one balance update per account in a single
+    # transaction. Returns the voucher id.
+    lines = voucher_lines(lines)
+    date = to_date_code(date)
+    account_ids = sorted({line[0] for line in lines})
+    net_change = {account_id: 0 for account_id in account_ids}
+    for account_id, debit, credit in lines:
+        net_change[account_id] += debit - credit
+
+    with transaction(conn):
+        check_open_period(conn, date)
+        placeholders = ', '.join('?' * len(account_ids))
+        known = conn.execute(f"SELECT COUNT(*) FROM accounts WHERE id IN ({placeholders})", account_ids).fetchone()[0]
+        if known != len(account_ids):
+            raise ValueError("Unknown account")
+
+        voucher_id = conn.execute("INSERT INTO vouchers (date, memo) VALUES (?, ?)", (date, memo)).lastrowid
+        conn.executemany("INSERT INTO journal_entries (date, account_id, debit, credit, voucher_id) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         [(date, account_id, debit, credit, voucher_id) for account_id, debit, credit in lines])
+        # Every account the voucher touches is updated, even by a zero change:
+        # the change stamps cached results are checked against come from
+        # these updates (schema.add_change_stamps)
+        conn.executemany("UPDATE accounts SET balance = balance + ? WHERE id = ?",
+                         [(change, account_id) for account_id, change in net_change.items()])
+    return voucher_id
+
+
+def get_voucher(conn, voucher_id):
+    # (id, date, memo) and its lines as (id, account name, debit, credit),
+    # or None
+    header = conn.execute("SELECT id, date, memo FROM vouchers WHERE id=?", (voucher_id,)).fetchone()
+    if header is None:
+        return None
+    header = (header[0], from_date_code(header[1]), header[2])
+    rows = conn.execute('''SELECT je.id, a.name, je.debit, je.credit
+                           FROM journal_entries AS je
+                           INNER JOIN accounts AS a ON je.account_id = a.id
+                           WHERE je.voucher_id = ? ORDER BY je.id''', (voucher_id,))
+    return header, [(entry_id, name, from_cents(debit), from_cents(credit)) for entry_id, name, debit, credit in rows]
+
+
+def delete_voucher(conn, voucher_id):
+    # Removes the voucher and its lines and reverses their balance changes
+    with transaction(conn):
+        row = conn.execute("SELECT date FROM vouchers WHERE id=?", (voucher_id,)).fetchone()
+        if row is None:
+            return
+        check_open_period(conn, row[0])
+        conn.execute('''UPDATE accounts SET balance = balance - (SELECT SUM(debit - credit) FROM journal_entries
+                                                                 WHERE voucher_id = ? AND account_id = accounts.id)
+                        WHERE id IN (SELECT account_id FROM journal_entries WHERE voucher_id = ?)''',
+                     (voucher_id, voucher_id))
+        conn.execute("DELETE FROM journal_entries WHERE voucher_id=?", (voucher_id,))
+        conn.execute("DELETE FROM vouchers WHERE id=?", (voucher_id,))
+
+
+JOURNAL_PAGE_SIZE = 200
+
+
+def get_journal_entries(conn):
+    rows = conn.execute('''SELECT je.id, je.date, a.name, je.debit, je.credit
+                           FROM journal_entries as je
+                           INNER JOIN accounts as a ON je.account_id = a.id''')
+    return [journal_row(row) for row in rows]
+
+
+def date_range(column, start_date=None, end_date=None):
+    # Conditions and parameters for an inclusive date range on an integer
+    # date column, which the date indexes answer with a range scan
+    conditions = []
+    params = []
+    start_date = optional_date_code(start_date)
+    end_date = optional_date_code(end_date)
+    if start_date is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append(f"{column} <= ?")
+        params.append(end_date)
+    return conditions, params
+
+
+def get_journal_page(conn, after_id=None, before_id=None, limit=JOURNAL_PAGE_SIZE,
+                     start_date=None, end_date=None):
+    # Keyset pagination on journal_entries.id: the page right after `after_id`,
+    # the page right before `before_id`, or the first page, optionally only
+    # within a date range. Rows are always returned in ascending id order; the
+    # lines of a voucher have consecutive ids and carry its id in the last
+    # column.
+    conditions, params = date_range('je.date', start_date, end_date)
+    order = "je.id"
+    if before_id is not None:
+        conditions.append("je.id < ?")
+        params.append(before_id)
+        order = "je.id DESC"
+    elif after_id is not None:
+        conditions.append("je.id > ?")
+        params.append(after_id)
+
+    query = '''SELECT je.id, je.date, a.name, je.debit, je.credit, COALESCE(je.voucher_id, '')
+               FROM journal_entries as je
+               INNER JOIN accounts as a ON je.account_id = a.id'''
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    rows = conn.execute(query + f" ORDER BY {order} LIMIT ?", params + [limit]).fetchall()
+    if before_id is not None:
+        rows.reverse()
+    return [journal_row(row) for row in rows]
+
+
+def opening_balance(conn, account_id, date, entry_id=None):
+    # Balance of the account just before `date` (or just before entry
+    # `entry_id` on that date). It is worked back from the live balance in
+    # accounts, so only the entries after that point are summed. In cents.
+    row = conn.execute("SELECT balance FROM accounts WHERE id=?", (account_id,)).fetchone()
+    balance = row[0] if row else 0
+    if entry_id is None:
+        later = conn.execute("SELECT COALESCE(SUM(debit - credit), 0) FROM journal_entries "
+                             "WHERE account_id = ? AND date >= ?", (account_id, date)).fetchone()[0]
+    else:
+        later = conn.execute("SELECT COALESCE(SUM(debit - credit), 0) FROM journal_entries "
+                             "WHERE account_id = ? AND (date, id) >= (?, ?)", (account_id, date, entry_id)).fetchone()[0]
+    return balance - later
+
+
+def with_running_balance(conn, rows):
+    # rows are (id, date, name, debit, credit, account_id) ordered by account,
+    # date and id. The running balance is accumulated in one pass, starting
+    # from the opening balance of each account's first row.
+    account_id = None
+    balance = 0
+    for entry_id, date, name, debit, credit, row_account_id in rows:
+        if row_account_id != account_id:
+            account_id = row_account_id
+            balance = opening_balance(conn, account_id, date, entry_id)
+        balance += debit - credit
+        yield entry_id, from_date_code(date), name, from_cents(debit), from_cents(credit), from_cents(balance)
+
+
+def ledger_query(account_id=None, start_date=None, end_date=None):
+    conditions, params = date_range('je.date', start_date, end_date)
+    if account_id is not None:
+        conditions.insert(0, "je.account_id = ?")
+        params.insert(0, account_id)
+    query = '''SELECT je.id, je.date, a.name, je.debit, je.credit, je.account_id
+               FROM journal_entries as je
+               INNER JOIN accounts as a ON je.account_id = a.id'''
+    return query, conditions, params
+
+
+def get_ledger(conn, account_id=None, start_date=None, end_date=None):
+    # Every ledger line in the filter, grouped by account with running balances
+    query, conditions, params = ledger_query(account_id, start_date, end_date)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY je.account_id, je.date, je.id"
+    return with_running_balance(conn, conn.execute(query, params))
+
+
+def get_ledger_page(conn, account_id=None, start_date=None, end_date=None,
+                    after_id=None, before_id=None, limit=JOURNAL_PAGE_SIZE):
+    # Keyset pagination in ledger order (account, date, id); the page boundary
+    # is given as a journal entry id and looked up by primary key.
+    query, conditions, params = ledger_query(account_id, start_date, end_date)
+    order = "je.account_id, je.date, je.id"
+    if before_id is not None:
+        conditions.append("(je.account_id, je.date, je.id) < "
+                          "(SELECT account_id, date, id FROM journal_entries WHERE id = ?)")
+        params.append(before_id)
+        order = "je.account_id DESC, je.date DESC, je.id DESC"
+    elif after_id is not None:
+        conditions.append("(je.account_id, je.date, je.id) > "
+                          "(SELECT account_id, date, id FROM journal_entries WHERE id = ?)")
+        params.append(after_id)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+
+    rows = conn.execute(query, params).fetchall()
+    if before_id is not None:
+        rows.reverse()
+    return list(with_running_balance(conn, rows))
+
+
+# Period close
+
+def last_closed_period(conn):
+    return conn.execute("SELECT MAX(period_end) FROM balance_snapshots").fetchone()[0]
+
+
+def check_open_period(conn, date):
+    # Snapshots of closed periods would go stale if their entries changed
+    closed = conn.execute("SELECT 1 FROM balance_snapshots WHERE period_end >= ? LIMIT 1",
+                          (to_date_code(date),)).fetchone()
+    if closed:
+        raise ValueError("Date is in a closed period")
+
+
+def close_period(conn, period_end):
+    # Store every account's balance at the end of `period_end`
+    period_end = to_date_code(period_end)
+    if last_closed_period(conn) is not None:
+        check_open_period(conn, period_end)
+    with transaction(conn):
+        balances = reports.balances_as_of(conn, period_end).fetchall()
+        conn.executemany("INSERT INTO balance_snapshots (period_end, account_id, balance) VALUES (?, ?, ?)",
+                         [(period_end, account_id, balance) for account_id, _, _, balance in balances])
+    return len(balances)
+
+
+def get_closed_periods(conn):
+    return [from_date_code(row[0])
+            for row in conn.execute("SELECT DISTINCT period_end FROM balance_snapshots ORDER BY period_end")]
+
+
+# Reports
+
+def report_text(conn, report, **params):
+    # Archived years are attached so reports reaching back into them, and the
+    # cash flow statement over the whole journal, stay complete. archive
+    # imports this module, hence the import here.
+    import archive
+    with archive.history(conn):
+        return render.render_text(conn, report, **params)
+
+
+def generate_balance_sheet(conn, as_of=None):
+    return report_text(conn, 'balance_sheet', as_of=as_of)
+
+
+def generate_cash_flow_statement(conn):
+    return report_text(conn, 'cash_flow_statement')
+
+
+def generate_trial_balance(conn, as_of=None):
+    return report_text(conn, 'trial_balance', as_of=as_of)
+
+
+def generate_income_statement(conn, start=None, end=None):
+    return report_text(conn, 'income_statement', start=start, end=end)
@@ -0,0 +1,221 @@
+import weakref
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only this module needs it
+    np = None
+
+import archive
+from cache import table_stamps
+from dates import to_date_code
+
+
+# Columnar journal snapshot for ad-hoc analysis. The journal joined to the
+# account types is loaded once into NumPy arrays (entry ids, account index,
+# day number, debit and credit cents) and group-by/pivot queries are answered
+# with vectorized operations instead of Python loops over rows.
+#
+# snapshot(conn) caches one snapshot per connection and reloads it only when
+# the accounts, the journal or the archives have been written to since, going
+# by their change stamps (see cache.py).
+#
+# Dates are coded as days since 1970-01-01, worked out from the stored
+# YYYYMMDD codes; entries without a date get -1 and are left out of date
+# filters and date groupings.
+#
+#   snap = analytics.snapshot(conn)
+#   months, types, cents = analytics.pivot(snap, 'month', 'type', 'net')
+
+DIMENSIONS = ('day', 'month', 'year', 'account', 'type')
+VALUES = ('debit', 'credit', 'net', 'count')
+
+ENTRY_DTYPE = [('id', np.int64), ('account_id', np.int64), ('date', np.int32),
+               ('debit', np.int64), ('credit', np.int64)] if np is not None else None
+
+cache = weakref.WeakKeyDictionary()
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Analytics needs numpy, install it with 'pip install numpy'")
+
+
+def day_numbers(codes):
+    # YYYYMMDD codes -> days since 1970-01-01, -1 for missing dates
+    codes = np.asarray(codes, dtype=np.int64)
+    months = (codes // 10000 - 1970) * 12 + codes // 100 % 100 - 1
+    days = months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + codes % 100 - 1
+    return np.where(codes > 0, days, -1).astype(np.int32)
+
+
+def day_number(date):
+    return int(day_numbers([to_date_code(date)])[0])
+
+
+class JournalSnapshot:
+    def __init__(self, account_ids, account_names, account_types, entries):
+        # entries is a structured array with id, account_id, date, debit and
+        # credit fields
+        self.account_ids = np.asarray(account_ids, dtype=np.int64)
+        self.account_names = list(account_names)
+        self.type_names = sorted(set(account_types))
+        self.account_type = np.array([self.type_names.index(t) for t in account_types], dtype=np.int8)
+
+        # Entries of accounts that no longer exist are dropped
+        account = np.searchsorted(self.account_ids, entries['account_id'])
+        known = account < len(self.account_ids)
+        known[known] = self.account_ids[account[known]] == entries['account_id'][known]
+        entries = entries[known]
+
+        self.id = entries['id']
+        self.account = account[known].astype(np.int32)
+        self.day = day_numbers(entries['date'])
+        self.debit = entries['debit']
+        self.credit = entries['credit']
+        self.net = self.debit - self.credit
+
+        # Month and year codes (months/years since 1970) are worked out once
+        days = self.day.astype('datetime64[D]')
+        self.month = days.astype('datetime64[M]').astype(np.int32)
+        self.year = days.astype('datetime64[Y]').astype(np.int16)
+        self.has_undated = bool((self.day < 0).any())
+
+    @classmethod
+    def load(cls, conn):
+        require_numpy()
+        # The whole journal, archived years included
+        with archive.history(conn):
+            accounts = conn.execute("SELECT id, name, type FROM accounts ORDER BY id").fetchall()
+            cursor = conn.execute('''SELECT id, account_id, COALESCE(date, 0), debit, credit
+                                     FROM journal_entries
+                                     ORDER BY id''')
+            entries = np.fromiter(cursor, dtype=ENTRY_DTYPE)
+        return cls([row[0] for row in accounts], [row[1] for row in accounts], [row[2] for row in accounts],
+                   entries)
+
+    def __len__(self):
+        return len(self.id)
+
+    def mask(self, start=None, end=None, account_type=None):
+        # Selection of entries dated start..end (inclusive, ISO dates) and/or
+        # of one account type; a plain slice when nothing is filtered, so the
+        # columns are not copied
+        if start is None and end is None and account_type is None:
+            return slice(None)
+        selected = np.ones(len(self), dtype=bool)
+        if start is not None:
+            selected &= self.day >= day_number(start)
+        if end is not None:
+            selected &= (self.day <= day_number(end)) & (self.day >= 0)
+        if account_type is not None:
+            if account_type not in self.type_names:
+                return np.zeros(len(self), dtype=bool)
+            selected &= self.account_type[self.account] == self.type_names.index(account_type)
+        return selected
+
+    def codes(self, dimension, selected):
+        # (integer codes of the selected entries, function turning codes
+        # into labels)
+        if dimension == 'account':
+            return self.account[selected], lambda codes: [self.account_names[code] for code in codes]
+        if dimension == 'type':
+            return (self.account_type[self.account[selected]].astype(np.int32),
+                    lambda codes: [self.type_names[code] for code in codes])
+
+        if dimension == 'day':
+            codes, unit = self.day[selected], 'D'
+        elif dimension == 'month':
+            codes, unit = self.month[selected], 'M'
+        elif dimension == 'year':
+            codes, unit = self.year[selected], 'Y'
+        else:
+            raise ValueError(f"Invalid dimension {dimension!r}, expected one of {DIMENSIONS}")
+        return codes, lambda codes: np.datetime_as_string(codes.astype(f'datetime64[{unit}]')).tolist()
+
+    def values(self, value, selected):
+        if value == 'debit':
+            return self.debit[selected]
+        if value == 'credit':
+            return self.credit[selected]
+        if value == 'net':
+            return self.net[selected]
+        if value == 'count':
+            return None
+        raise ValueError(f"Invalid value {value!r}, expected one of {VALUES}")
+
+
+# Stamped tables a snapshot depends on; journal writes show up in accounts
+SNAPSHOT_TABLES = ('accounts', 'archives')
+
+
+def snapshot(conn):
+    version = table_stamps(conn, SNAPSHOT_TABLES)
+    cached = cache.get(conn)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    snap = JournalSnapshot.load(conn)
+    cache[conn] = (version, snap)
+    return snap
+
+
+def dense(codes):
+    # (distinct codes in order, index of each code among them). Codes are
+    # small integer ranges (days, months, accounts), so this counts instead
+    # of sorting.
+    if len(codes) == 0:
+        return codes, codes
+    codes = codes.astype(np.int64)
+    low = codes.min()
+    present = np.bincount(codes - low) > 0
+    keys = np.flatnonzero(present)
+    position = np.cumsum(present) - 1
+    return keys + low, position[codes - low]
+
+
+def sums(index, weights, size):
+    # Totals per index. bincount adds in float64, which is exact for totals
+    # below 2**53 cents.
+    if weights is None:
+        return np.bincount(index, minlength=size).astype(np.int64)
+    return np.rint(np.bincount(index, weights, minlength=size)).astype(np.int64)
+
+
+def undated_excluded(snap, dimension, selected):
+    if not snap.has_undated or dimension not in ('day', 'month', 'year'):
+        return selected
+    dated = snap.day >= 0
+    return dated if isinstance(selected, slice) else selected & dated
+
+
+def group_by(snap, dimension, value='net', start=None, end=None, account_type=None):
+    # (labels, totals) with one total per group, in group order. Amounts are
+    # int64 cents.
+    selected = undated_excluded(snap, dimension, snap.mask(start, end, account_type))
+    codes, labels = snap.codes(dimension, selected)
+    keys, index = dense(codes)
+    return labels(keys), sums(index, snap.values(value, selected), len(keys))
+
+
+def pivot(snap, rows='month', columns='type', value='net', start=None, end=None, account_type=None):
+    # (row labels, column labels, int64 matrix of cents) for the value summed
+    # over every rows x columns cell
+    selected = snap.mask(start, end, account_type)
+    selected = undated_excluded(snap, columns, undated_excluded(snap, rows, selected))
+    row_codes, row_labels = snap.codes(rows, selected)
+    column_codes, column_labels = snap.codes(columns, selected)
+    row_keys, row_index = dense(row_codes)
+    column_keys, column_index = dense(column_codes)
+
+    cell = row_index.astype(np.int64) * len(column_keys) + column_index
+    matrix = sums(cell, snap.values(value, selected), len(row_keys) * len(column_keys))
+    return row_labels(row_keys), column_labels(column_keys), matrix.reshape(len(row_keys), len(column_keys))
+
+
+def top_movers(snap, start=None, end=None, limit=10, account_type=None):
+    # Accounts with the largest net change between start and end, as
+    # (account id, name, type, net cents), biggest absolute change first
+    selected = snap.mask(start, end, account_type)
+    net = sums(snap.account[selected], snap.net[selected], len(snap.account_ids))
+    order = np.argsort(-np.abs(net), kind='stable')[:limit]
+    return [(int(snap.account_ids[i]), snap.account_names[i], snap.type_names[snap.account_type[i]], int(net[i]))
+            for i in order if net[i]]
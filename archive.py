@@ -0,0 +1,235 @@
+import csv
+import json
+import os
+from contextlib import contextmanager, nullcontext
+
+import accounting
+from dates import from_date_code, optional_date_code
+from money import from_cents
+from unitofwork import transaction
+
+
+# Archival of closed years and streaming journal export.
+#
+# archive_year() moves one closed fiscal year's journal entries and vouchers
+# out of the live database into a file of its own next to it
+# (books.db -> books_2021.db) and records it in the archives table. Only years
+# that end on or before the last closed period can be archived; the period
+# snapshots carry their balances forward, so the live file answers everything
+# from the first closed period after the archived years onwards.
+#
+# Reports that reach back into archived years, and those summing the whole
+# journal such as the cash flow statement, run inside history(conn). It
+# ATTACHes the archives and shadows journal_entries and vouchers with TEMP
+# views over the live and archived rows, so the report code reads the full
+# journal unchanged.
+#
+# export_journal() writes a date range of the journal to CSV or JSON Lines,
+# row by row from the cursor, in the columns importer.py reads back.
+
+EXPORT_COLUMNS = ['id', 'date', 'account_id', 'account', 'debit', 'credit', 'voucher_id']
+
+# Columns of the archived tables, in the order the history views list them;
+# live tables may have more columns or a different order
+ARCHIVED_COLUMNS = {
+    'vouchers': ['id', 'date', 'memo'],
+    'journal_entries': ['id', 'date', 'account_id', 'debit', 'credit', 'voucher_id'],
+}
+
+
+def main_path(conn):
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return path
+    return ''
+
+
+def archive_path(conn, year, archive_dir=None):
+    db_path = main_path(conn)
+    if not db_path and archive_dir is None:
+        raise ValueError("An in-memory database needs an archive directory")
+    stem = os.path.splitext(os.path.basename(db_path))[0] if db_path else 'books'
+    return os.path.join(archive_dir or os.path.dirname(db_path), f"{stem}_{year}.db")
+
+
+def resolve(conn, path):
+    # Paths in the archives table are relative to the main database
+    return os.path.join(os.path.dirname(main_path(conn)), path)
+
+
+def create_archive_tables(conn, schema_name):
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {schema_name}.vouchers (
+                     id INTEGER PRIMARY KEY,
+                     date INTEGER,
+                     memo TEXT
+                  )''')
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {schema_name}.journal_entries (
+                     id INTEGER PRIMARY KEY,
+                     date INTEGER,
+                     account_id INTEGER,
+                     debit INTEGER,
+                     credit INTEGER,
+                     voucher_id INTEGER
+                  )''')
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema_name}.journal_entries_account_date "
+                 f"ON journal_entries(account_id, date)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema_name}.journal_entries_date ON journal_entries(date)")
+
+
+def get_archives(conn):
+    return conn.execute("SELECT year, path, entries FROM archives ORDER BY year").fetchall()
+
+
+def archive_year(conn, year, archive_dir=None, vacuum=False):
+    # Moves the entries dated in `year` to the year's archive file and returns
+    # how many were moved. Safe to run again after an interruption: the copy
+    # skips rows already archived and the delete only removes archived rows.
+    year = int(year)
+    start, end = year * 10000 + 101, year * 10000 + 1231
+    closed = accounting.last_closed_period(conn)
+    if closed is None or closed < end:
+        raise ValueError(f"Close a period ending on or after {from_date_code(end)} before archiving {year}")
+
+    path = archive_path(conn, year, archive_dir)
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        # A transaction over attached databases is not atomic as a whole in
+        # WAL mode, so the archive copy is committed before the live rows go
+        with transaction(conn):
+            create_archive_tables(conn, 'archive')
+            conn.execute('''INSERT OR IGNORE INTO archive.vouchers (id, date, memo)
+                            SELECT id, date, memo FROM main.vouchers WHERE date BETWEEN ? AND ?''', (start, end))
+            conn.execute('''INSERT OR IGNORE INTO archive.journal_entries
+                                (id, date, account_id, debit, credit, voucher_id)
+                            SELECT id, date, account_id, debit, credit, voucher_id
+                            FROM main.journal_entries WHERE date BETWEEN ? AND ?''', (start, end))
+
+        with transaction(conn):
+            # The archived entries' totals move into the opening balances,
+            # which keeps balance = opening_balance + live journal total
+            conn.execute('''UPDATE accounts SET opening_balance = opening_balance + archived.total
+                            FROM (SELECT account_id, SUM(debit - credit) AS total FROM archive.journal_entries
+                                  WHERE date BETWEEN ? AND ?
+                                    AND id IN (SELECT id FROM main.journal_entries)
+                                  GROUP BY account_id) AS archived
+                            WHERE accounts.id = archived.account_id''', (start, end))
+            moved = conn.execute('''DELETE FROM main.journal_entries WHERE date BETWEEN ? AND ?
+                                    AND id IN (SELECT id FROM archive.journal_entries)''', (start, end)).rowcount
+            conn.execute('''DELETE FROM main.vouchers WHERE date BETWEEN ? AND ?
+                            AND id IN (SELECT id FROM archive.vouchers)''', (start, end))
+            entries = conn.execute("SELECT COUNT(*) FROM archive.journal_entries").fetchone()[0]
+            relative = os.path.relpath(path, os.path.dirname(main_path(conn)) or '.')
+            conn.execute("INSERT OR REPLACE INTO archives (year, path, entries) VALUES (?, ?, ?)",
+                         (year, relative, entries))
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+    if vacuum:
+        conn.execute("VACUUM")
+    return moved
+
+
+@contextmanager
+def history(conn, years=None):
+    # Makes the archived years (all, or just `years`) readable as part of
+    # journal_entries and vouchers for the duration of the block. Nothing is
+    # attached when there are no archives.
+    # Inside another history() block the archives are already attached and
+    # the views in place, so there is nothing to do.
+    archives = [row for row in get_archives(conn) if years is None or row[0] in years]
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if not archives or any(name.startswith('archive_') for name in attached):
+        yield conn
+        return
+
+    names = []
+    try:
+        for year, path, _ in archives:
+            name = f"archive_{year}"
+            conn.execute("ATTACH DATABASE ? AS " + name, (resolve(conn, path),))
+            names.append(name)
+        for table, columns in ARCHIVED_COLUMNS.items():
+            select = ', '.join(columns)
+            parts = [f"SELECT {select} FROM {schema_name}.{table}" for schema_name in ['main'] + names]
+            conn.execute(f"CREATE TEMP VIEW {table} AS " + " UNION ALL ".join(parts))
+        yield conn
+    finally:
+        for table in ARCHIVED_COLUMNS:
+            conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+        for name in names:
+            conn.execute("DETACH DATABASE " + name)
+
+
+def journal_rows(conn, start_date=None, end_date=None):
+    # Cursor over the journal in date order, for export
+    conditions, params = accounting.date_range('je.date', start_date, end_date)
+    query = '''SELECT je.id, je.date, je.account_id, a.name, je.debit, je.credit, je.voucher_id
+               FROM journal_entries AS je
+               LEFT JOIN accounts AS a ON je.account_id = a.id'''
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return conn.execute(query + " ORDER BY je.date, je.id", params)
+
+
+def export_journal(conn, path, start_date=None, end_date=None, format='csv', include_archives=True):
+    # Writes the journal (or the entries from start_date to end_date) to
+    # `path` as CSV or JSON Lines and returns the number of rows written
+    if format not in ('csv', 'jsonl'):
+        raise ValueError(f"Invalid format {format!r}")
+    start_date = optional_date_code(start_date)
+    end_date = optional_date_code(end_date)
+    years = None
+    if start_date is not None or end_date is not None:
+        first = (start_date or 0) // 10000
+        last = (end_date or 99999999) // 10000
+        years = range(first, last + 1)
+
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out) if format == 'csv' else None
+        if writer:
+            writer.writerow(EXPORT_COLUMNS)
+        with history(conn, years) if include_archives else nullcontext(conn):
+            for entry_id, date, account_id, name, debit, credit, voucher_id in journal_rows(conn, start_date,
+                                                                                            end_date):
+                row = [entry_id, from_date_code(date), account_id, name, str(from_cents(debit)),
+                       str(from_cents(credit)), voucher_id]
+                if writer:
+                    writer.writerow(row)
+                else:
+                    out.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n')
+                count += 1
+    return count
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive closed years and export the journal")
+    parser.add_argument('--db', default=accounting.DEFAULT_DB_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    archive_parser = commands.add_parser('archive', help="move a closed year into its own file")
+    archive_parser.add_argument('year', type=int)
+    archive_parser.add_argument('--dir', help="directory for the archive file, next to the database by default")
+    archive_parser.add_argument('--vacuum', action='store_true', help="shrink the live file afterwards")
+
+    commands.add_parser('list', help="list the archived years")
+
+    export_parser = commands.add_parser('export', help="write journal entries to CSV or JSON Lines")
+    export_parser.add_argument('output')
+    export_parser.add_argument('--start', help="first date, YYYY-MM-DD")
+    export_parser.add_argument('--end', help="last date, YYYY-MM-DD")
+    export_parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    export_parser.add_argument('--live-only', action='store_true', help="leave out archived years")
+    args = parser.parse_args()
+
+    db = accounting.connect(args.db)
+    if args.command == 'archive':
+        print(f"{archive_year(db, args.year, args.dir, args.vacuum)} entries archived")
+    elif args.command == 'list':
+        for year, path, entries in get_archives(db):
+            print(f"{year}  {entries:>10} entries  {path}")
+    else:
+        total = export_journal(db, args.output, args.start, args.end, args.format, not args.live_only)
+        print(f"{total} entries exported")
@@ -0,0 +1,226 @@
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import time
+
+import accounting
+import cache
+import importer
+import render
+from dates import from_date_code, to_date_code
+
+
+# Benchmarks at scale. generate() writes a reproducible synthetic book (chart
+# of accounts plus journal) into a scratch database; run_benchmarks() then
+# times the paths the GUI depends on against it: the journal and ledger views,
+# account search, every report, and posting. Results are JSON records, one per
+# benchmark and book size, so runs of two versions can be compared with
+# --compare.
+#
+#   python bench.py --lines 10000 100000 1000000 --output results.json
+#   python bench.py --lines 10000 100000 --compare results.json
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+DEFAULT_TYPE_MIX = {'Asset': 30, 'Liability': 15, 'Equity': 5, 'Income': 20, 'Expense': 30}
+
+NAME_WORDS = ['Cash', 'Receivable', 'Payable', 'Inventory', 'Prepaid', 'Accrued', 'Deferred', 'Capital',
+              'Revenue', 'Sales', 'Service', 'Rent', 'Utilities', 'Payroll', 'Travel', 'Supplies',
+              'Interest', 'Tax', 'Equipment', 'Loan']
+
+SEARCH_TERMS = ['Ca', 'Cash', 'ceiv', 'Payroll 1', 'zzz']
+
+
+def parse_type_mix(text):
+    # "Asset=3,Expense=1" -> {'Asset': 3, 'Expense': 1}
+    mix = {}
+    for part in text.split(','):
+        account_type, _, weight = part.partition('=')
+        if account_type not in accounting.ACCOUNT_TYPES:
+            raise ValueError(f"Invalid account type {account_type!r}")
+        mix[account_type] = float(weight or 1)
+    return mix
+
+
+def generate(conn, lines, accounts=1000, days=730, start='2020-01-01', type_mix=None, seed=1,
+             progress=None):
+    # Same arguments, same book. Entries are posted in date order over `days`
+    # days through the bulk importer; returns the seconds the import took.
+    rng = random.Random(seed)
+    type_mix = type_mix or DEFAULT_TYPE_MIX
+    types = list(type_mix)
+    weights = [type_mix[account_type] for account_type in types]
+
+    rows = []
+    for n in range(1, accounts + 1):
+        account_type = rng.choices(types, weights)[0]
+        rows.append((f"{rng.choice(NAME_WORDS)} {account_type} {n}", account_type, 0, to_date_code(start)))
+    with conn:
+        conn.executemany("INSERT INTO accounts (name, type, balance, created_date) VALUES (?, ?, ?, ?)", rows)
+    account_ids = [row[0] for row in conn.execute("SELECT id FROM accounts ORDER BY id")]
+
+    first_day = datetime.date.fromisoformat(start)
+
+    def journal():
+        for i in range(lines):
+            amount = rng.randrange(1, 1_000_000)
+            debit, credit = (amount, 0) if rng.random() < 0.5 else (0, amount)
+            yield {'date': (first_day + datetime.timedelta(days=i * days // lines)).isoformat(),
+                   'account_id': rng.choice(account_ids),
+                   'debit': f"{debit // 100}.{debit % 100:02d}",
+                   'credit': f"{credit // 100}.{credit % 100:02d}"}
+
+    started = time.perf_counter()
+    importer.import_journal(conn, journal(), progress)
+    return time.perf_counter() - started
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def scroll_journal(conn, pages):
+    rows = accounting.get_journal_page(conn)
+    for _ in range(pages - 1):
+        if not rows:
+            break
+        rows = accounting.get_journal_page(conn, after_id=rows[-1][0])
+
+
+def busiest_account(conn):
+    return conn.execute("SELECT account_id FROM journal_entries GROUP BY account_id "
+                        "ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+
+
+def benchmarks(conn, posts):
+    # (name, function) pairs, each standing in for one GUI action
+    account_id = busiest_account(conn)
+    last_date = from_date_code(conn.execute("SELECT MAX(date) FROM journal_entries").fetchone()[0])
+    middle_id = conn.execute("SELECT MAX(id) / 2 FROM journal_entries").fetchone()[0]
+
+    yield 'journal_first_page', lambda: accounting.get_journal_page(conn)
+    yield 'journal_scroll_10_pages', lambda: scroll_journal(conn, 10)
+    yield 'journal_page_middle', lambda: accounting.get_journal_page(conn, after_id=middle_id)
+    yield 'ledger_first_page', lambda: accounting.get_ledger_page(conn)
+    yield 'ledger_account_first_page', lambda: accounting.get_ledger_page(conn, account_id)
+    yield 'ledger_account_full', lambda: list(accounting.get_ledger(conn, account_id))
+    for term in SEARCH_TERMS:
+        yield f"search_{term.replace(' ', '_')}", \
+            lambda term=term: accounting.search_accounts(conn, term, accounting.SEARCH_LIMIT)
+    # The comparative statements over the two halves of the book
+    first_date = from_date_code(conn.execute("SELECT MIN(date) FROM journal_entries").fetchone()[0])
+    middle_date = from_date_code(conn.execute("SELECT date FROM journal_entries WHERE id >= ? ORDER BY id LIMIT 1",
+                                              (middle_id,)).fetchone()[0])
+    report_params = {'comparative_balance_sheet': {'dates': [middle_date, last_date]},
+                     'comparative_income_statement': {'period_ends': [first_date, middle_date, last_date]}}
+    for report in sorted(render.REPORTS):
+        yield f"report_{report}", \
+            lambda report=report: render.render_text(conn, report, **report_params.get(report, {}))
+    yield 'report_balance_sheet_as_of', lambda: render.render_text(conn, 'balance_sheet', as_of=last_date)
+    # The same report asked for again with nothing written in between
+    report_cache = cache.ResultCache()
+    yield 'report_trial_balance_cached', lambda: report_cache.get(
+        conn, cache.make_key('trial_balance', {}), lambda: render.render_text(conn, 'trial_balance'))
+
+    # Posting writes to the book, so it goes last. Each post is its own
+    # transaction, as when entered through the GUI.
+    def post():
+        for _ in range(posts):
+            accounting.add_journal_entry(conn, last_date, account_id, '12.34', '10.00')
+    yield f"post_{posts}_entries", post
+
+
+def run_benchmarks(db_path, lines, accounts=1000, days=730, type_mix=None, seed=1, repeat=3, posts=100,
+                   only=None, progress=None):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = accounting.connect(db_path)
+    try:
+        setup = {'lines': lines, 'accounts': accounts, 'days': days, 'seed': seed}
+        results = [dict(setup, benchmark='bulk_import',
+                        times=[generate(conn, lines, accounts, days, type_mix=type_mix, seed=seed)])]
+        conn.execute("ANALYZE")
+        for name, func in benchmarks(conn, posts):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            if progress:
+                progress(lines, name)
+            results.append(dict(setup, benchmark=name, times=timed(func, repeat)))
+    finally:
+        conn.close()
+
+    for result in results:
+        result['best'] = min(result['times'])
+        result['median'] = statistics.median(result['times'])
+    return results
+
+
+def environment():
+    try:
+        version = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        version = None
+    return {'version': version or None,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds')}
+
+
+def compare(old, new):
+    # Yields (lines, benchmark, old best, new best) for benchmarks in both runs
+    before = {(result['lines'], result['benchmark']): result['best'] for result in old['results']}
+    for result in new['results']:
+        key = (result['lines'], result['benchmark'])
+        if key in before:
+            yield key + (before[key], result['best'])
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time the GUI's database paths on synthetic books")
+    parser.add_argument('--lines', type=int, nargs='+', default=DEFAULT_SIZES, help="journal lines per book")
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=730, help="date span of the journal")
+    parser.add_argument('--mix', type=parse_type_mix, help="account type weights, e.g. Asset=3,Expense=2")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--posts', type=int, default=100, help="single entries posted in the posting benchmark")
+    parser.add_argument('--only', nargs='+', help="run only benchmarks whose name contains one of these")
+    parser.add_argument('--db', default='bench.db', help="scratch database, overwritten")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    run = {'environment': environment(), 'results': []}
+    for lines in args.lines:
+        run['results'] += run_benchmarks(args.db, lines, args.accounts, args.days, args.mix, args.seed,
+                                         args.repeat, args.posts, args.only,
+                                         progress=lambda lines, name: print(f"{lines} lines: {name:<50}", end='\r'))
+        print(' ' * 70, end='\r')
+        for result in run['results']:
+            if result['lines'] == lines:
+                print(f"{lines:>10} {result['benchmark']:<40} {result['best'] * 1000:>10.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print(f"\n{'lines':<10} {'benchmark':<40} {'before ms':>10} {'after ms':>10} {'change':>8}")
+        for lines, name, before, after in compare(old, run):
+            print(f"{lines:>10} {name:<40} {before * 1000:>10.2f} {after * 1000:>10.2f} {after / before - 1:>+8.0%}")
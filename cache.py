@@ -0,0 +1,98 @@
+from collections import OrderedDict
+
+
+# Memoized query results, for reports and ledger pages that get asked for
+# again while nothing they depend on has changed.
+#
+# Results are kept per key (the report or query and its parameters) together
+# with the change stamps of what they were computed from. Triggers
+# (schema.add_change_stamps) give a table a new stamp on every write and an
+# account a new stamp when its name or balances change, which every posting
+# does. Other connections' commits show up in them like this connection's own
+# writes. A lookup reads the stamps its entry depends on and only that entry
+# is recomputed when one has moved: a posting to one account leaves the cached
+# ledger pages of every other account current. At most max_entries results
+# are kept, the least recently used go first.
+#
+# A cache belongs to one connection and is used from that connection's thread,
+# e.g. the GUI's worker.
+#
+#   text = report_cache.get(conn, make_key('trial_balance', {}), lambda: render.render_text(conn, 'trial_balance'))
+#   page = ledger_cache.get(conn, key, lambda: accounting.get_ledger_page(conn, account_id), account_id=account_id)
+
+DEFAULT_MAX_ENTRIES = 32
+
+# Stamped tables the reports depend on; journal writes show up in accounts
+REPORT_TABLES = ('accounts', 'balance_snapshots', 'archives')
+
+# Stamped tables a ledger page of every account depends on
+LEDGER_TABLES = ('accounts',)
+
+
+def table_stamps(conn, tables):
+    placeholders = ', '.join('?' * len(tables))
+    return tuple(conn.execute(f"SELECT name, stamp FROM table_stamps WHERE name IN ({placeholders}) ORDER BY name",
+                              tables))
+
+
+def account_stamp(conn, account_id):
+    # None for an account not written since the stamps were added
+    row = conn.execute("SELECT stamp FROM account_stamps WHERE account_id = ?", (account_id,)).fetchone()
+    return row[0] if row else None
+
+
+def stamps(conn, tables=REPORT_TABLES, account_id=None):
+    # What a result depends on: one account's stamp, or those of whole tables
+    if account_id is not None:
+        return account_stamp(conn, account_id)
+    return table_stamps(conn, tables)
+
+
+def make_key(name, params):
+    # Hashable key for a query and its keyword parameters
+    return name, tuple(sorted(params.items()))
+
+
+class ResultCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.looked_up = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, conn, key, tables=REPORT_TABLES, account_id=None):
+        # (True, result) when the result for `key` was computed from what the
+        # tables (or the account) hold now, (False, None) otherwise
+        current = stamps(conn, tables, account_id)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == current:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+        self.looked_up[key] = current
+        self.misses += 1
+        return False, None
+
+    def store(self, key, result):
+        # Stored under the stamps seen by the lookup before computing it: a
+        # write in between makes the result stale at the next lookup rather
+        # than passing it off as current
+        self.entries[key] = (self.looked_up.pop(key), result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, conn, key, compute, tables=REPORT_TABLES, account_id=None):
+        found, result = self.lookup(conn, key, tables, account_id)
+        if not found:
+            result = compute()
+            self.store(key, result)
+        return result
+
+    def clear(self):
+        self.entries.clear()
+        self.looked_up.clear()
@@ -0,0 +1,130 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import accounting
+import archive
+import reports
+
+
+# Consolidation across entities, one database per subsidiary. Each entity's
+# account balances are read in a separate worker process with its own
+# read-only connection, so the entities are read in parallel and the whole run
+# takes about as long as the slowest entity. The balances are then mapped onto
+# the consolidated chart and summed in the parent.
+#
+# The consolidated chart is a mapping of (entity, account name) to
+# consolidated account name; accounts without a mapping keep their own name.
+# Mapping an account to '' leaves it out, e.g. for intercompany balances that
+# eliminate on consolidation. A mapping file is a CSV with the columns
+# entity, account, consolidated_account. Entities are named after their
+# database file without the extension.
+
+SECTION_KEYS = [('assets', 'Asset'), ('liabilities', 'Liability'), ('equity', 'Equity')]
+
+CONSOLIDATED_COLUMNS = [('Account', 40, False), ('Type', 10, False), ('Balance', 20, True)]
+
+
+def entity_name(db_path):
+    return os.path.splitext(os.path.basename(db_path))[0]
+
+
+def read_mapping(path):
+    with open(path, newline='') as f:
+        return {(row['entity'], row['account']): row['consolidated_account'] for row in csv.DictReader(f)}
+
+
+def entity_balances(db_path, as_of=None):
+    # Runs in a worker process: (name, type, balance) for every account
+    conn = accounting.connect_read_only(db_path)
+    try:
+        if as_of is None:
+            rows = conn.execute("SELECT id, name, type, balance FROM accounts ORDER BY id").fetchall()
+        else:
+            # Dates before the first closed period may be in archived years
+            with archive.history(conn):
+                rows = reports.balances_as_of(conn, as_of).fetchall()
+        return [(name, account_type, balance) for _, name, account_type, balance in rows]
+    finally:
+        conn.close()
+
+
+def read_entities(db_paths, as_of=None, workers=None):
+    # {entity: rows}; workers=1 reads them one after another in this process
+    names = [entity_name(path) for path in db_paths]
+    if len(set(names)) != len(names):
+        raise ValueError("Entity database names must be unique")
+    if workers == 1:
+        return {name: entity_balances(path, as_of) for name, path in zip(names, db_paths)}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(entity_balances, db_paths, [as_of] * len(db_paths))
+        return dict(zip(names, results))
+
+
+def merge(entities, mapping=None):
+    # {(consolidated name, type): {entity: cents}}, in first-seen order
+    mapping = mapping or {}
+    merged = {}
+    for entity, rows in entities.items():
+        for name, account_type, balance in rows:
+            target = mapping.get((entity, name), name)
+            if not target:
+                continue
+            by_entity = merged.setdefault((target, account_type), {})
+            by_entity[entity] = by_entity.get(entity, 0) + balance
+    return merged
+
+
+def consolidated_balance_sheet(db_paths, as_of=None, mapping=None, workers=None):
+    # {'entities': [...], 'assets': rows, 'total_assets': cents, ...} with
+    # (name, type, cents, {entity: cents}) rows for the consolidated accounts,
+    # plus the trial balance's total_debit and total_credit
+    merged = merge(read_entities(db_paths, as_of, workers), mapping)
+    report = {'entities': [entity_name(path) for path in db_paths]}
+    for key, account_type in SECTION_KEYS:
+        rows = [(name, row_type, sum(by_entity.values()), by_entity)
+                for (name, row_type), by_entity in merged.items() if row_type == account_type]
+        report[key] = rows
+        report['total_' + key] = sum(row[2] for row in rows)
+
+    # Trial balance totals over every consolidated account
+    balances = [sum(by_entity.values()) for by_entity in merged.values()]
+    report['total_debit'] = sum(balance for balance in balances if balance > 0)
+    report['total_credit'] = -sum(balance for balance in balances if balance < 0)
+    return report
+
+
+def stream_consolidated_balance_sheet(report, sink, as_of=None):
+    title = 'CONSOLIDATED BALANCE SHEET'
+    sink.begin(title if as_of is None else f'{title} AS OF {as_of}')
+    for (title, _, total_label), (key, _) in zip(reports.BALANCE_SHEET_SECTIONS, SECTION_KEYS):
+        sink.section(title, CONSOLIDATED_COLUMNS)
+        for name, account_type, balance, _ in report[key]:
+            sink.row((name, account_type, balance))
+        sink.total(total_label, report['total_' + key])
+    sink.total('Total Liabilities and Equity', report['total_liabilities'] + report['total_equity'])
+    sink.end()
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    import render
+
+    parser = argparse.ArgumentParser(description="Consolidate the balance sheets of several entity databases")
+    parser.add_argument('databases', nargs='+')
+    parser.add_argument('--as-of', help="balances as of YYYY-MM-DD")
+    parser.add_argument('--map', help="CSV with entity, account, consolidated_account columns")
+    parser.add_argument('--format', choices=sorted(render.SINKS), default='text')
+    parser.add_argument('--output', help="file to write, standard output by default")
+    parser.add_argument('--workers', type=int, help="worker processes, one per CPU by default")
+    args = parser.parse_args()
+
+    report = consolidated_balance_sheet(args.databases, args.as_of, args.map and read_mapping(args.map),
+                                        args.workers)
+    if args.output:
+        with open(args.output, 'w', newline='' if args.format == 'csv' else None, encoding='utf-8') as out:
+            stream_consolidated_balance_sheet(report, render.SINKS[args.format](out), args.as_of)
+    else:
+        stream_consolidated_balance_sheet(report, render.SINKS[args.format](sys.stdout), args.as_of)
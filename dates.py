@@ -0,0 +1,58 @@
+import datetime
+
+
+# Dates are stored as YYYYMMDD integers everywhere in the database, so they
+# sort and compare as numbers and date ranges are plain integer range
+# predicates on the date indexes. Dates coming in (date objects, ISO strings,
+# the MM/DD/YY text of the date pickers, or codes) are parsed with
+# to_date_code, and dates shown to users go through from_date_code, which
+# gives an ISO string.
+
+INPUT_FORMATS = ['%m/%d/%y', '%m/%d/%Y', '%Y%m%d']
+
+
+def date_code(date):
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+def to_date_code(value):
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return date_code(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            # ISO dates are by far the most common, and fromisoformat is fast
+            return date_code(datetime.date.fromisoformat(text))
+        except ValueError:
+            pass
+        for date_format in INPUT_FORMATS:
+            try:
+                return date_code(datetime.datetime.strptime(text, date_format))
+            except ValueError:
+                pass
+    raise ValueError(f"Invalid date {value!r}")
+
+
+def from_date_code(code):
+    if code is None:
+        return None
+    return f"{code // 10000:04d}-{code // 100 % 100:02d}-{code % 100:02d}"
+
+
+def previous_day(value):
+    # Code of the day before `value`, e.g. to turn an inclusive start date
+    # into the end of the period before it
+    code = to_date_code(value)
+    day = datetime.date(code // 10000, code // 100 % 100, code % 100)
+    return date_code(day - datetime.timedelta(days=1))
+
+
+def optional_date_code(value):
+    # For optional filters: None and '' stay None
+    if value is None or value == '':
+        return None
+    return to_date_code(value)
@@ -0,0 +1,68 @@
+# In-memory index of the chart of accounts: id to (id, name, type), name to
+# ids and type to ids. It is loaded once with load() and then kept current
+# with add/update/remove as accounts change, so lookups while posting never
+# scan the account list. Names are not unique in the accounts table; id_for
+# returns the lowest id with that name.
+
+class AccountDirectory:
+    def __init__(self, rows=()):
+        self.by_id = {}
+        self.by_name = {}
+        self.by_type = {}
+        for account_id, name, account_type in rows:
+            self.add(account_id, name, account_type)
+
+    @classmethod
+    def load(cls, conn):
+        return cls(conn.execute("SELECT id, name, type FROM accounts ORDER BY id"))
+
+    def add(self, account_id, name, account_type):
+        account_id = int(account_id)
+        old = self.by_id.get(account_id)
+        if old is not None:
+            self.unindex(old)
+        # Replacing an existing key keeps its place, so names() stays in id order
+        self.by_id[account_id] = (account_id, name, account_type)
+        ids = self.by_name.setdefault(name, [])
+        ids.append(account_id)
+        ids.sort()
+        self.by_type.setdefault(account_type, set()).add(account_id)
+
+    def update(self, account_id, name, account_type):
+        self.add(account_id, name, account_type)
+
+    def remove(self, account_id):
+        account = self.by_id.pop(int(account_id), None)
+        if account is not None:
+            self.unindex(account)
+
+    def unindex(self, account):
+        account_id, name, account_type = account
+        ids = self.by_name[name]
+        ids.remove(account_id)
+        if not ids:
+            del self.by_name[name]
+        self.by_type[account_type].discard(account_id)
+
+    def __contains__(self, account_id):
+        return int(account_id) in self.by_id
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def get(self, account_id):
+        return self.by_id.get(int(account_id))
+
+    def id_for(self, name):
+        ids = self.by_name.get(name)
+        return ids[0] if ids else None
+
+    def name_for(self, account_id):
+        account = self.by_id.get(int(account_id))
+        return account[1] if account else None
+
+    def ids_of_type(self, account_type):
+        return self.by_type.get(account_type, set())
+
+    def names(self):
+        return [account[1] for account in self.by_id.values()]
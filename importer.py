@@ -0,0 +1,137 @@
+import csv
+import json
+from collections import defaultdict
+
+import accounting
+from dates import to_date_code
+from directory import AccountDirectory
+from money import to_cents
+from unitofwork import transaction
+
+
+# Bulk journal import. Rows are streamed from a CSV or JSON Lines file (or any
+# iterable of dicts), validated, and posted in batches with executemany inside
+# a single transaction. Balance changes are netted per account and applied
+# with one UPDATE per touched account at the end.
+#
+# Each row needs `date`, `debit`, `credit` and either `account_id` or
+# `account` (the account name).
+
+IMPORT_BATCH_SIZE = 5000
+
+
+class JournalImportError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_rows(path):
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return read_jsonl(path)
+    return read_csv(path)
+
+
+def validate_row(row, line, accounts, closed_until=None):
+    date = row.get('date')
+    if not date:
+        raise JournalImportError(line, "Missing date")
+    try:
+        date = to_date_code(date)
+    except ValueError:
+        raise JournalImportError(line, f"Invalid date {date!r}")
+    if closed_until is not None and date <= closed_until:
+        raise JournalImportError(line, "Date is in a closed period")
+
+    account_id = row.get('account_id')
+    if account_id not in (None, ''):
+        try:
+            account_id = int(account_id)
+        except ValueError:
+            raise JournalImportError(line, f"Invalid account id {account_id!r}")
+        if account_id not in accounts:
+            raise JournalImportError(line, f"Unknown account id {account_id}")
+    else:
+        name = row.get('account')
+        account_id = accounts.id_for(name)
+        if account_id is None:
+            raise JournalImportError(line, f"Unknown account {name!r}")
+
+    try:
+        debit = to_cents(row.get('debit') or 0)
+        credit = to_cents(row.get('credit') or 0)
+    except ValueError:
+        raise JournalImportError(line, "Invalid debit or credit amount")
+    if debit < 0 or credit < 0:
+        raise JournalImportError(line, "Debit and Credit cannot be negative")
+    if debit == 0 and credit == 0:
+        raise JournalImportError(line, "Debit or Credit should be greater than zero")
+
+    return date, account_id, debit, credit
+
+
+def insert_batch(conn, batch):
+    conn.executemany("INSERT INTO journal_entries (date, account_id, debit, credit) VALUES (?, ?, ?, ?)", batch)
+
+
+def import_journal(conn, rows, progress=None, batch_size=IMPORT_BATCH_SIZE):
+    # Resolve account names to ids once for the whole import
+    accounts = AccountDirectory.load(conn)
+    closed_until = accounting.last_closed_period(conn)
+
+    net_change = defaultdict(int)
+    batch = []
+    count = 0
+    # A validation error rolls back everything imported so far
+    with transaction(conn):
+        for line, row in enumerate(rows, 1):
+            entry = validate_row(row, line, accounts, closed_until)
+            batch.append(entry)
+            net_change[entry[1]] += entry[2] - entry[3]
+
+            if len(batch) >= batch_size:
+                insert_batch(conn, batch)
+                count += len(batch)
+                batch = []
+                if progress:
+                    progress(count)
+
+        if batch:
+            insert_batch(conn, batch)
+            count += len(batch)
+
+        # Update the account balances, once per touched account
+        conn.executemany("UPDATE accounts SET balance = balance + ? WHERE id = ?",
+                         [(change, account_id) for account_id, change in net_change.items()])
+
+    if progress:
+        progress(count)
+    return count
+
+
+def import_journal_file(conn, path, progress=None):
+    return import_journal(conn, read_rows(path), progress)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("usage: python importer.py FILE.csv|FILE.jsonl [DATABASE]")
+        sys.exit(1)
+
+    db = accounting.connect(sys.argv[2] if len(sys.argv) > 2 else accounting.DEFAULT_DB_PATH)
+    total = import_journal_file(db, sys.argv[1], progress=lambda n: print(f"{n} lines imported", end='\r'))
+    print(f"{total} lines imported")
@@ -0,0 +1,179 @@
+import bisect
+import collections
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# Timing for SQL statements, executor jobs and GUI callbacks, switched on and
+# off at runtime with enable()/disable(). When off, every hook is a single
+# check of `enabled`.
+#
+# Timings are collected into latency histograms by name:
+#   sql:<statement>   one execute() on a connection from accounting.connect,
+#                     up to the first row for queries
+#   job:<key>         a QueryExecutor job on the worker thread
+#   callback:<key>    its result callback on the Tk thread (Treeview filling)
+#   ui:<function>     a button command or event handler
+# Statements slower than `slow_query_seconds` also go to the slow-query log
+# with their EXPLAIN QUERY PLAN. export() writes both to a JSON file.
+#
+# Set ACCOUNTSYSTEM_INSTRUMENT=1 to start with instrumentation on.
+
+# Bucket upper bounds in milliseconds
+BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+SLOW_QUERY_SECONDS = 0.1
+SLOW_QUERY_LOG_SIZE = 200
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+enabled = False
+slow_query_seconds = SLOW_QUERY_SECONDS
+histograms = {}
+slow_queries = collections.deque(maxlen=SLOW_QUERY_LOG_SIZE)
+lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding that fraction of the samples
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + [self.max], self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {'count': self.count,
+                'total_ms': self.total,
+                'mean_ms': self.total / self.count if self.count else 0,
+                'max_ms': self.max,
+                'p50_ms': self.percentile(0.5),
+                'p95_ms': self.percentile(0.95),
+                'buckets_ms': dict(zip([str(bound) for bound in BUCKETS] + ['inf'], self.counts))}
+
+
+def enable(slow_seconds=None):
+    global enabled, slow_query_seconds
+    if slow_seconds is not None:
+        slow_query_seconds = slow_seconds
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with lock:
+        histograms.clear()
+        slow_queries.clear()
+
+
+def record(name, seconds):
+    with lock:
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.add(seconds)
+
+
+def timed(func, name=None):
+    # Decorator for GUI callbacks
+    name = 'ui:' + (name or func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - started)
+    return wrapper
+
+
+def statement_name(sql):
+    # Collapse whitespace so the same statement always lands in one histogram
+    return 'sql:' + ' '.join(sql.split())
+
+
+def log_slow_query(conn, sql, params, seconds):
+    plan = None
+    if params is not None and sql.lstrip().upper().startswith(EXPLAINABLE):
+        try:
+            plan = [row[-1] for row in sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params)]
+        except sqlite3.Error:
+            pass
+    with lock:
+        slow_queries.append({'time': time.time(),
+                             'ms': seconds * 1000,
+                             'sql': ' '.join(sql.split()),
+                             'plan': plan})
+
+
+class Connection(sqlite3.Connection):
+    # Connection factory for sqlite3.connect that times execute() and
+    # executemany(). Both bypass the timing when instrumentation is off.
+
+    def execute(self, sql, params=()):
+        if not enabled:
+            return super().execute(sql, params)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self.finished(sql, params, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_params):
+        if not enabled:
+            return super().executemany(sql, seq_of_params)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            # No single set of parameters to explain the plan with
+            self.finished(sql, None, time.perf_counter() - started)
+
+    def finished(self, sql, params, seconds):
+        record(statement_name(sql), seconds)
+        if seconds >= slow_query_seconds:
+            log_slow_query(self, sql, params, seconds)
+
+
+def summary():
+    with lock:
+        return {name: histogram.as_dict() for name, histogram in sorted(histograms.items())}
+
+
+def export(path):
+    with lock:
+        slow = list(slow_queries)
+    with open(path, 'w') as f:
+        json.dump({'histograms': summary(), 'slow_queries': slow,
+                   'slow_query_seconds': slow_query_seconds}, f, indent=2)
+
+
+if os.environ.get('ACCOUNTSYSTEM_INSTRUMENT'):
+    enable()
@@ -0,0 +1,88 @@
+from unitofwork import transaction
+
+
+# Verifies the denormalized accounts.balance against the journal. An account
+# is consistent when
+#
+#   balance = opening_balance + SUM(debit - credit) of its journal entries
+#
+# A full check aggregates the whole journal in one grouped pass. Triggers
+# (schema.add_balance_verification) record every account whose entries or
+# balance change in unverified_accounts, so an incremental check only sums
+# the entries of those accounts, through the account_id index. Accounts that
+# check out are removed from unverified_accounts; discrepancies stay there
+# until they are repaired.
+#
+# Both return discrepancies as (account id, name, stored balance, journal
+# balance), in cents.
+
+FULL_CHECK = '''SELECT a.id, a.name, a.balance, a.opening_balance + COALESCE(j.total, 0)
+                FROM accounts AS a
+                LEFT JOIN (SELECT account_id, SUM(debit - credit) AS total
+                           FROM journal_entries GROUP BY account_id) AS j ON j.account_id = a.id'''
+
+INCREMENTAL_CHECK = '''SELECT a.id, a.name, a.balance,
+                              a.opening_balance + (SELECT COALESCE(SUM(debit - credit), 0) FROM journal_entries
+                                                   WHERE account_id = a.id)
+                       FROM unverified_accounts AS u
+                       INNER JOIN accounts AS a ON a.id = u.account_id'''
+
+
+def check(conn, incremental=False):
+    # Runs inside the caller's transaction; returns the discrepancies
+    rows = conn.execute(INCREMENTAL_CHECK if incremental else FULL_CHECK)
+    return [row for row in rows if row[2] != row[3]]
+
+
+def mark_verified(conn, discrepancies):
+    bad = [row[0] for row in discrepancies]
+    if bad:
+        placeholders = ', '.join('?' * len(bad))
+        conn.execute(f"DELETE FROM unverified_accounts WHERE account_id NOT IN ({placeholders})", bad)
+    else:
+        conn.execute("DELETE FROM unverified_accounts")
+
+
+def verify(conn, incremental=False):
+    # One consistent view of accounts and journal; writers wait until done
+    with transaction(conn):
+        discrepancies = check(conn, incremental)
+        mark_verified(conn, discrepancies)
+    return discrepancies
+
+
+def repair(conn, account_ids=None):
+    # Sets the balance of the given accounts (or of every account that does
+    # not match) back to what the journal says; returns the repaired rows
+    with transaction(conn):
+        discrepancies = check(conn)
+        if account_ids is not None:
+            wanted = {int(account_id) for account_id in account_ids}
+            discrepancies = [row for row in discrepancies if row[0] in wanted]
+        conn.executemany("UPDATE accounts SET balance = ? WHERE id = ?",
+                         [(expected, account_id) for account_id, _, _, expected in discrepancies])
+        mark_verified(conn, check(conn))
+    return discrepancies
+
+
+def pending(conn):
+    return conn.execute("SELECT COUNT(*) FROM unverified_accounts").fetchone()[0]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import accounting
+    from money import from_cents
+
+    parser = argparse.ArgumentParser(description="Check account balances against the journal")
+    parser.add_argument('--db', default=accounting.DEFAULT_DB_PATH)
+    parser.add_argument('--incremental', action='store_true', help="only accounts changed since the last check")
+    parser.add_argument('--repair', action='store_true', help="set mismatched balances to the journal's")
+    args = parser.parse_args()
+
+    db = accounting.connect(args.db)
+    rows = repair(db) if args.repair else verify(db, args.incremental)
+    for account_id, name, stored, expected in rows:
+        print(f"{account_id:>8} {name:<40} stored {from_cents(stored):>14} journal {from_cents(expected):>14}")
+    print(f"{len(rows)} accounts {'repaired' if args.repair else 'do not match the journal'}")
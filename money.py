@@ -0,0 +1,22 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+
+# Amounts are stored as integer cents everywhere in the database, so SUMs in
+# SQLite are exact integer arithmetic. Values entered by users are parsed with
+# to_cents, and amounts shown to users go through from_cents, which gives a
+# Decimal with two places.
+
+def to_cents(value):
+    if isinstance(value, float):
+        value = repr(value)
+    try:
+        amount = Decimal(str(value).strip().replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount {value!r}")
+    return int(amount.scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    return Decimal(cents or 0).scaleb(-2)
@@ -0,0 +1,268 @@
+import csv
+import html
+import io
+import json
+
+import reports
+from money import from_cents
+
+
+# Report sinks. reports.stream_* push a report through one of these a row at
+# a time: TextSink writes the fixed-width layout shown in the GUI, CsvSink and
+# HtmlSink write exports. All of them write to a file-like object as they go;
+# ChunkedWriter batches that output into chunks for a callback, which is how
+# the GUI fills its Text widgets without holding the whole report.
+
+REPORTS = {
+    'balance_sheet': reports.stream_balance_sheet,
+    'income_statement': reports.stream_income_statement,
+    'cash_flow_statement': reports.stream_cash_flow_statement,
+    'trial_balance': reports.stream_trial_balance,
+    'comparative_balance_sheet': reports.stream_comparative_balance_sheet,
+    'comparative_income_statement': reports.stream_comparative_income_statement,
+}
+
+# Keyword parameters each report takes
+REPORT_PARAMS = {
+    'balance_sheet': ('as_of',),
+    'income_statement': ('start', 'end'),
+    'cash_flow_statement': (),
+    'trial_balance': ('as_of',),
+    'comparative_balance_sheet': ('dates',),
+    'comparative_income_statement': ('period_ends',),
+}
+
+# Parameters a report cannot do without
+REQUIRED_PARAMS = {
+    'comparative_balance_sheet': ('dates',),
+    'comparative_income_statement': ('period_ends',),
+}
+
+
+def money_text(cents):
+    return f"${from_cents(cents):,.2f}"
+
+
+class TextSink:
+    def __init__(self, out):
+        self.out = out
+        self.columns = []
+        self.width = 0
+        self.after_total = False
+
+    def begin(self, title):
+        self.out.write(f"{title}\n\n")
+
+    def section(self, title, columns):
+        self.columns = columns
+        self.width = sum(width + 3 for _, width, _ in columns) + 1
+        rule = '-' * self.width
+        header = ' | '.join(f"{name:<{width}}" for name, width, _ in columns)
+        self.out.write(f"{rule}\n|{title:^{self.width - 2}}|\n{rule}\n| {header} |\n{rule}\n")
+        self.after_total = False
+
+    def row(self, values):
+        cells = []
+        for value, (_, width, is_money) in zip(values, self.columns):
+            if is_money:
+                cells.append(f"{money_text(value):>{width}}")
+            else:
+                cells.append(f"{str(value)[:width]:<{width}}")
+        self.out.write(f"| {' | '.join(cells)} |\n")
+        self.after_total = False
+
+    def total(self, label, cents):
+        width = self.columns[-1][1]
+        label_width = self.width - width - 7
+        rule = '-' * self.width
+        if not self.after_total:
+            self.out.write(f"{rule}\n")
+        self.out.write(f"| {label:<{label_width}} | {money_text(cents):>{width}} |\n{rule}\n")
+        self.after_total = True
+
+    def end(self):
+        self.out.write("\n")
+
+
+class CsvSink:
+    def __init__(self, out):
+        self.writer = csv.writer(out)
+        self.columns = []
+
+    def begin(self, title):
+        self.writer.writerow([title])
+
+    def section(self, title, columns):
+        self.columns = columns
+        self.writer.writerow([])
+        self.writer.writerow([title])
+        self.writer.writerow([name for name, _, _ in columns])
+
+    def row(self, values):
+        self.writer.writerow([str(from_cents(value)) if is_money else value
+                              for value, (_, _, is_money) in zip(values, self.columns)])
+
+    def total(self, label, cents):
+        self.writer.writerow([label] + [''] * (len(self.columns) - 2) + [str(from_cents(cents))])
+
+    def end(self):
+        pass
+
+
+class HtmlSink:
+    def __init__(self, out):
+        self.out = out
+        self.columns = []
+        self.in_table = False
+
+    def begin(self, title):
+        self.out.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+                       f"</head><body>\n<h1>{html.escape(title)}</h1>\n")
+
+    def close_table(self):
+        if self.in_table:
+            self.out.write("</table>\n")
+            self.in_table = False
+
+    def section(self, title, columns):
+        self.close_table()
+        self.columns = columns
+        header = ''.join(f"<th>{html.escape(name)}</th>" for name, _, _ in columns)
+        self.out.write(f"<h2>{html.escape(title)}</h2>\n<table>\n<tr>{header}</tr>\n")
+        self.in_table = True
+
+    def row(self, values):
+        cells = []
+        for value, (_, _, is_money) in zip(values, self.columns):
+            if is_money:
+                cells.append(f"<td class=\"money\">{html.escape(money_text(value))}</td>")
+            else:
+                cells.append(f"<td>{html.escape(str(value))}</td>")
+        self.out.write(f"<tr>{''.join(cells)}</tr>\n")
+
+    def total(self, label, cents):
+        if not self.in_table:
+            self.out.write("<table>\n")
+            self.in_table = True
+        self.out.write(f"<tr class=\"total\"><th colspan=\"{len(self.columns) - 1}\">{html.escape(label)}</th>"
+                       f"<td class=\"money\">{html.escape(money_text(cents))}</td></tr>\n")
+
+    def end(self):
+        self.close_table()
+        self.out.write("</body></html>\n")
+
+
+class JsonSink:
+    # Money is written as decimal strings so no precision is lost
+    def __init__(self, out):
+        self.out = out
+        self.report = None
+        self.section_rows = None
+        self.columns = []
+
+    def begin(self, title):
+        self.report = {'title': title, 'sections': []}
+
+    def section(self, title, columns):
+        self.columns = columns
+        self.section_rows = []
+        self.report['sections'].append({'title': title,
+                                        'columns': [name for name, _, _ in columns],
+                                        'rows': self.section_rows,
+                                        'totals': []})
+
+    def row(self, values):
+        self.section_rows.append([str(from_cents(value)) if is_money else value
+                                  for value, (_, _, is_money) in zip(values, self.columns)])
+
+    def total(self, label, cents):
+        # Totals go with the section above them, as in the text layout
+        self.report['sections'][-1]['totals'].append({'label': label, 'amount': str(from_cents(cents))})
+
+    def end(self):
+        json.dump(self.report, self.out)
+
+
+SINKS = {
+    'text': TextSink,
+    'csv': CsvSink,
+    'html': HtmlSink,
+    'json': JsonSink,
+}
+
+
+class ChunkedWriter:
+    # File-like object that hands its output to `callback` in pieces of about
+    # `chunk_size` characters
+    def __init__(self, callback, chunk_size=65536):
+        self.callback = callback
+        self.chunk_size = chunk_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.callback(''.join(self.parts))
+            self.parts = []
+            self.size = 0
+
+
+def render(conn, report, sink, **params):
+    REPORTS[report](conn, sink, **params)
+
+
+def render_text(conn, report, **params):
+    out = io.StringIO()
+    render(conn, report, TextSink(out), **params)
+    return out.getvalue()
+
+
+def render_chunks(conn, report, callback, chunk_size=65536, **params):
+    out = ChunkedWriter(callback, chunk_size)
+    render(conn, report, TextSink(out), **params)
+    out.flush()
+
+
+def export(conn, report, path, format='text', **params):
+    with open(path, 'w', newline='' if format == 'csv' else None, encoding='utf-8') as out:
+        render(conn, report, SINKS[format](out), **params)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import accounting
+    import archive
+
+    parser = argparse.ArgumentParser(description="Export a report without the GUI")
+    parser.add_argument('report', choices=sorted(REPORTS))
+    parser.add_argument('output')
+    parser.add_argument('--format', choices=sorted(SINKS), default='text')
+    parser.add_argument('--db', default=accounting.DEFAULT_DB_PATH)
+    parser.add_argument('--as-of', help="balance sheet and trial balance as of YYYY-MM-DD")
+    parser.add_argument('--start', help="income statement from YYYY-MM-DD, included")
+    parser.add_argument('--end', help="income statement up to YYYY-MM-DD, included")
+    parser.add_argument('--dates', nargs='+', help="comparative balance sheet dates, YYYY-MM-DD")
+    parser.add_argument('--period-ends', nargs='+', help="comparative income statement period ends, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    given = {name for name in ('as_of', 'start', 'end', 'dates', 'period_ends') if getattr(args, name) is not None}
+    unused = given.difference(REPORT_PARAMS[args.report])
+    if unused:
+        parser.error(f"{args.report} does not take " + ', '.join('--' + name.replace('_', '-') for name in sorted(unused)))
+    missing = set(REQUIRED_PARAMS.get(args.report, ())).difference(given)
+    if missing:
+        parser.error(f"{args.report} needs " + ', '.join('--' + name.replace('_', '-') for name in sorted(missing)))
+    params = {name: getattr(args, name) for name in given}
+    db = accounting.connect(args.db)
+    try:
+        with archive.history(db):
+            export(db, args.report, args.output, args.format, **params)
+    except ValueError as e:
+        parser.error(str(e))
@@ -0,0 +1,235 @@
+from dates import previous_day, to_date_code
+
+
+# Report engine. The stream_* functions walk each report straight from
+# aggregated queries and cursors into a sink (see render.py), which is how
+# reports are displayed and exported. Amounts are integer cents.
+
+BALANCE_SHEET_TYPES = ['Asset', 'Liability', 'Equity']
+
+# Criteria for operating, investing, and financing activities based on account types
+CASH_FLOW_CATEGORIES = {
+    'Income': 'operating',
+    'Expense': 'operating',
+    'Asset': 'investing',
+    'Liability': 'financing',
+    'Equity': 'financing',
+}
+
+
+# As-of-date balances. A period close stores every account's closing balance
+# in balance_snapshots; a balance at any date is then the nearest snapshot at or
+# before it plus the journal delta since, so only that delta is read.
+
+def latest_snapshot(conn, as_of):
+    return conn.execute("SELECT MAX(period_end) FROM balance_snapshots WHERE period_end <= ?",
+                        (to_date_code(as_of),)).fetchone()[0]
+
+
+def balances_as_of(conn, as_of, account_type=None):
+    # Cursor over (id, name, type, balance) for every account, or every
+    # account of one type, at the end of `as_of`
+    as_of = to_date_code(as_of)
+    snapshot = latest_snapshot(conn, as_of)
+    type_filter = "" if account_type is None else "WHERE a.type = ?"
+    type_params = () if account_type is None else (account_type,)
+    if snapshot is None:
+        # No closed period yet, work back from the live balances
+        return conn.execute(f'''SELECT a.id, a.name, a.type, a.balance - COALESCE(later.total, 0)
+                                FROM accounts AS a
+                                LEFT JOIN (SELECT account_id, SUM(debit - credit) AS total
+                                           FROM journal_entries WHERE date > ?
+                                           GROUP BY account_id) AS later ON later.account_id = a.id
+                                {type_filter}
+                                ORDER BY a.id''', (as_of,) + type_params)
+
+    # Accounts opened after the snapshot have no row in it and are worked back
+    # from their live balance instead
+    return conn.execute(f'''SELECT a.id, a.name, a.type,
+                                   CASE WHEN s.balance IS NOT NULL THEN s.balance + COALESCE(since.total, 0)
+                                        ELSE a.balance - (SELECT COALESCE(SUM(debit - credit), 0)
+                                                          FROM journal_entries
+                                                          WHERE account_id = a.id AND date > ?) END
+                            FROM accounts AS a
+                            LEFT JOIN balance_snapshots AS s ON s.account_id = a.id AND s.period_end = ?
+                            LEFT JOIN (SELECT account_id, SUM(debit - credit) AS total
+                                       FROM journal_entries WHERE date > ? AND date <= ?
+                                       GROUP BY account_id) AS since ON since.account_id = a.id
+                            {type_filter}
+                            ORDER BY a.id''', (as_of, snapshot, snapshot, as_of) + type_params)
+
+
+def cash_flow_statement(conn):
+    # A debit counts as an inflow and a credit as an outflow; a line with both
+    # only counts its debit, as the original per-row loop did.
+    rows = conn.execute('''SELECT a.type,
+                                  SUM(CASE WHEN je.debit > 0 THEN je.debit
+                                           WHEN je.credit > 0 THEN -je.credit
+                                           ELSE 0 END)
+                           FROM journal_entries AS je
+                           INNER JOIN accounts AS a ON je.account_id = a.id
+                           GROUP BY a.type''').fetchall()
+
+    result = {'operating': 0, 'investing': 0, 'financing': 0}
+    for account_type, total in rows:
+        category = CASH_FLOW_CATEGORIES.get(account_type)
+        if category:
+            result[category] += total
+    result['net'] = result['operating'] + result['investing'] + result['financing']
+    return result
+
+
+# Streaming. Sinks receive begin(title), section(title, columns), row(values),
+# total(label, cents) and end(); columns are (name, width, is_money) and money
+# values are in cents. Only totals are accumulated, rows are passed straight
+# through from the cursor.
+
+ACCOUNT_COLUMNS = [('ID', 6, False), ('Name', 40, False), ('Type', 10, False), ('Balance', 20, True)]
+
+BALANCE_SHEET_SECTIONS = [
+    ('ASSETS', 'Asset', 'Total Assets'),
+    ('LIABILITIES', 'Liability', 'Total Liabilities'),
+    ('EQUITY', 'Equity', 'Total Equity'),
+]
+
+INCOME_STATEMENT_SECTIONS = [
+    ('INCOME', 'Income', 'Total Income'),
+    ('EXPENSES', 'Expense', 'Total Expenses'),
+]
+
+
+def account_balances(conn, account_type, as_of=None):
+    if as_of is None:
+        return conn.execute("SELECT id, name, type, balance FROM accounts WHERE type = ? ORDER BY id",
+                            (account_type,))
+    return balances_as_of(conn, as_of, account_type)
+
+
+def stream_accounts(sink, title, rows, total_label):
+    sink.section(title, ACCOUNT_COLUMNS)
+    total = 0
+    for row in rows:
+        sink.row(row)
+        total += row[3]
+    sink.total(total_label, total)
+    return total
+
+
+def stream_balance_sheet(conn, sink, as_of=None):
+    sink.begin('BALANCE SHEET' if as_of is None else f'BALANCE SHEET AS OF {as_of}')
+    totals = {}
+    for title, account_type, total_label in BALANCE_SHEET_SECTIONS:
+        totals[account_type] = stream_accounts(sink, title, account_balances(conn, account_type, as_of), total_label)
+    sink.total('Total Liabilities and Equity', totals['Liability'] + totals['Equity'])
+    sink.end()
+
+
+def period_balances(conn, account_type, after, end):
+    # Change of each balance after the end of `after` up to the end of `end`
+    # (the live balance when `end` is None). Both cursors list the same
+    # accounts in id order, so they can be zipped.
+    closing = account_balances(conn, account_type, end)
+    if after is None:
+        return closing
+    opening = balances_as_of(conn, after, account_type)
+    return ((row[0], row[1], row[2], row[3] - before[3]) for row, before in zip(closing, opening))
+
+
+def stream_income_statement(conn, sink, start=None, end=None):
+    # From the beginning of `start` to the end of `end`, both included; either
+    # may be left open
+    if start is None and end is None:
+        sink.begin('INCOME STATEMENT')
+    else:
+        sink.begin(f'INCOME STATEMENT {start or "..."} TO {end or "..."}')
+    after = None if start is None else previous_day(start)
+    totals = {}
+    for title, account_type, total_label in INCOME_STATEMENT_SECTIONS:
+        rows = period_balances(conn, account_type, after, end)
+        totals[account_type] = stream_accounts(sink, title, rows, total_label)
+    sink.total('NET INCOME', totals['Income'] - totals['Expense'])
+    sink.end()
+
+
+def stream_cash_flow_statement(conn, sink):
+    report = cash_flow_statement(conn)
+    sink.begin('CASH FLOW STATEMENT')
+    sink.section('ACTIVITIES', [('Activity', 40, False), ('Amount', 20, True)])
+    sink.row(('Operating activities', report['operating']))
+    sink.row(('Investing activities', report['investing']))
+    sink.row(('Financing activities', report['financing']))
+    sink.total('NET CASH FLOW', report['net'])
+    sink.end()
+
+
+def stream_trial_balance(conn, sink, as_of=None):
+    sink.begin('TRIAL BALANCE' if as_of is None else f'TRIAL BALANCE AS OF {as_of}')
+    sink.section('ACCOUNTS', [('Account', 40, False), ('Balance', 20, True)])
+    if as_of is None:
+        rows = conn.execute("SELECT name, balance FROM accounts ORDER BY id")
+    else:
+        rows = ((name, balance) for _, name, _, balance in balances_as_of(conn, as_of))
+
+    # Positive balances are debits, negative balances are credits
+    total_debit = 0
+    total_credit = 0
+    for name, balance in rows:
+        sink.row((name, balance))
+        if balance > 0:
+            total_debit += balance
+        elif balance < 0:
+            total_credit -= balance
+    sink.total('Total Debit', total_debit)
+    sink.total('Total Credit', total_credit)
+    sink.end()
+
+
+# Comparative statements: one money column per date or period, side by side.
+# The balances_as_of cursors of every column list the same accounts in id
+# order, so they are zipped row by row. Section totals are rows of their own,
+# since a sink total carries a single amount.
+
+def comparative_columns(labels, width=20):
+    return [('ID', 6, False), ('Name', 40, False)] + [(label, width, True) for label in labels]
+
+
+def stream_comparative_section(sink, title, columns, cursors, total_label):
+    sink.section(title, columns)
+    totals = [0] * len(cursors)
+    for rows in zip(*cursors):
+        balances = [row[3] for row in rows]
+        sink.row((rows[0][0], rows[0][1], *balances))
+        totals = [total + balance for total, balance in zip(totals, balances)]
+    sink.row(('', total_label, *totals))
+    return totals
+
+
+def stream_comparative_balance_sheet(conn, sink, dates):
+    # Balance sheets as of each of `dates`, e.g. the last three year ends
+    if not dates:
+        raise ValueError("A comparative balance sheet needs at least one date")
+    sink.begin('COMPARATIVE BALANCE SHEET')
+    columns = comparative_columns(dates)
+    totals = {}
+    for title, account_type, total_label in BALANCE_SHEET_SECTIONS:
+        cursors = [balances_as_of(conn, as_of, account_type) for as_of in dates]
+        totals[account_type] = stream_comparative_section(sink, title, columns, cursors, total_label)
+    sink.row(('', 'Total Liabilities and Equity',
+              *[liability + equity for liability, equity in zip(totals['Liability'], totals['Equity'])]))
+    sink.end()
+
+
+def stream_comparative_income_statement(conn, sink, period_ends):
+    # One statement per period between consecutive period ends, e.g.
+    # ['2024-03-31', '2024-06-30', '2024-09-30'] gives Q2 and Q3
+    if len(period_ends) < 2:
+        raise ValueError("A comparative income statement needs at least two period ends")
+    periods = list(zip(period_ends, period_ends[1:]))
+    sink.begin('COMPARATIVE INCOME STATEMENT')
+    columns = comparative_columns([f"{start} to {end}" for start, end in periods], width=24)
+    totals = {}
+    for title, account_type, total_label in INCOME_STATEMENT_SECTIONS:
+        cursors = [period_balances(conn, account_type, start, end) for start, end in periods]
+        totals[account_type] = stream_comparative_section(sink, title, columns, cursors, total_label)
+    sink.row(('', 'NET INCOME', *[income - expense for income, expense in zip(totals['Income'], totals['Expense'])]))
+    sink.end()
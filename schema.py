@@ -0,0 +1,320 @@
+import sqlite3
+
+from dates import to_date_code
+
+
+# Versioned schema migrations. The database's PRAGMA user_version records how
+# many entries of MIGRATIONS have been applied; migrate() runs the rest in
+# order, each one in its own transaction. Existing chart_of_accounts.db files
+# start at version 0 and are upgraded in place.
+
+
+def create_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS accounts (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    type TEXT,
+                    balance REAL,
+                    created_date TEXT
+                 )''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS journal_entries (
+                    id INTEGER PRIMARY KEY,
+                    date TEXT,
+                    account_id INTEGER,
+                    debit REAL,
+                    credit REAL,
+                    FOREIGN KEY(account_id) REFERENCES accounts(id)
+                 )''')
+
+
+def add_indexes(conn):
+    # Ledger joins and per-account date ranges, plain date ranges, report
+    # grouping by account type and account name lookups
+    conn.execute("CREATE INDEX IF NOT EXISTS journal_entries_account_date ON journal_entries(account_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS journal_entries_date ON journal_entries(date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS accounts_type ON accounts(type)")
+    conn.execute("CREATE INDEX IF NOT EXISTS accounts_name ON accounts(name)")
+
+
+def add_balance_snapshots(conn):
+    # Closing balance of every account at the end of each closed period
+    conn.execute('''CREATE TABLE IF NOT EXISTS balance_snapshots (
+                    period_end TEXT,
+                    account_id INTEGER,
+                    balance REAL,
+                    PRIMARY KEY(period_end, account_id),
+                    FOREIGN KEY(account_id) REFERENCES accounts(id)
+                 )''')
+
+
+def money_to_integer_cents(conn):
+    # REAL amounts become INTEGER cents. Column types cannot be changed in
+    # place, so each table is rebuilt and its rows copied across.
+    conn.execute('''CREATE TABLE accounts_new (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    type TEXT,
+                    balance INTEGER,
+                    created_date TEXT
+                 )''')
+    conn.execute('''INSERT INTO accounts_new (id, name, type, balance, created_date)
+                    SELECT id, name, type, CAST(ROUND(COALESCE(balance, 0) * 100) AS INTEGER), created_date
+                    FROM accounts''')
+
+    conn.execute('''CREATE TABLE journal_entries_new (
+                    id INTEGER PRIMARY KEY,
+                    date TEXT,
+                    account_id INTEGER,
+                    debit INTEGER,
+                    credit INTEGER,
+                    FOREIGN KEY(account_id) REFERENCES accounts(id)
+                 )''')
+    conn.execute('''INSERT INTO journal_entries_new (id, date, account_id, debit, credit)
+                    SELECT id, date, account_id,
+                           CAST(ROUND(COALESCE(debit, 0) * 100) AS INTEGER),
+                           CAST(ROUND(COALESCE(credit, 0) * 100) AS INTEGER)
+                    FROM journal_entries''')
+
+    conn.execute('''CREATE TABLE balance_snapshots_new (
+                    period_end TEXT,
+                    account_id INTEGER,
+                    balance INTEGER,
+                    PRIMARY KEY(period_end, account_id),
+                    FOREIGN KEY(account_id) REFERENCES accounts(id)
+                 )''')
+    conn.execute('''INSERT INTO balance_snapshots_new (period_end, account_id, balance)
+                    SELECT period_end, account_id, CAST(ROUND(balance * 100) AS INTEGER)
+                    FROM balance_snapshots''')
+
+    for table in ['balance_snapshots', 'journal_entries', 'accounts']:
+        conn.execute(f"DROP TABLE {table}")
+    for table in ['accounts', 'journal_entries', 'balance_snapshots']:
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    add_indexes(conn)
+
+
+def add_account_search_index(conn):
+    # Trigram full-text index over account names, kept in sync by triggers.
+    # SQLite builds without FTS5 skip it and searches fall back to LIKE.
+    try:
+        conn.execute('''CREATE VIRTUAL TABLE accounts_fts USING fts5(
+                        name, content='accounts', content_rowid='id', tokenize='trigram'
+                     )''')
+    except sqlite3.OperationalError:
+        return
+
+    conn.execute('''CREATE TRIGGER accounts_fts_insert AFTER INSERT ON accounts BEGIN
+                        INSERT INTO accounts_fts (rowid, name) VALUES (new.id, new.name);
+                    END''')
+    conn.execute('''CREATE TRIGGER accounts_fts_delete AFTER DELETE ON accounts BEGIN
+                        INSERT INTO accounts_fts (accounts_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                    END''')
+    conn.execute('''CREATE TRIGGER accounts_fts_update AFTER UPDATE OF name ON accounts BEGIN
+                        INSERT INTO accounts_fts (accounts_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                        INSERT INTO accounts_fts (rowid, name) VALUES (new.id, new.name);
+                    END''')
+    conn.execute("INSERT INTO accounts_fts (accounts_fts) VALUES ('rebuild')")
+
+
+def add_vouchers(conn):
+    # A voucher is one balanced transaction; its split lines are the
+    # journal_entries rows that point to it. Entries posted one at a time have
+    # no voucher.
+    conn.execute('''CREATE TABLE IF NOT EXISTS vouchers (
+                    id INTEGER PRIMARY KEY,
+                    date TEXT,
+                    memo TEXT
+                 )''')
+    conn.execute("ALTER TABLE journal_entries ADD COLUMN voucher_id INTEGER REFERENCES vouchers(id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS journal_entries_voucher ON journal_entries(voucher_id)")
+
+
+def stored_date_code(value):
+    # Dates that cannot be parsed become NULL rather than failing the upgrade
+    if value is None:
+        return None
+    try:
+        return to_date_code(value)
+    except ValueError:
+        return None
+
+
+def dates_to_integer_codes(conn):
+    # TEXT dates become INTEGER YYYYMMDD codes. As for the cents, the tables
+    # are rebuilt since column types cannot be changed in place; the FTS
+    # triggers go with the accounts table and are created again.
+    conn.create_function('date_code', 1, stored_date_code, deterministic=True)
+
+    conn.execute('''CREATE TABLE accounts_new (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    type TEXT,
+                    balance INTEGER,
+                    created_date INTEGER
+                 )''')
+    conn.execute('''INSERT INTO accounts_new (id, name, type, balance, created_date)
+                    SELECT id, name, type, balance, date_code(created_date) FROM accounts''')
+
+    conn.execute('''CREATE TABLE vouchers_new (
+                    id INTEGER PRIMARY KEY,
+                    date INTEGER,
+                    memo TEXT
+                 )''')
+    conn.execute("INSERT INTO vouchers_new (id, date, memo) SELECT id, date_code(date), memo FROM vouchers")
+
+    conn.execute('''CREATE TABLE journal_entries_new (
+                    id INTEGER PRIMARY KEY,
+                    date INTEGER,
+                    account_id INTEGER,
+                    debit INTEGER,
+                    credit INTEGER,
+                    voucher_id INTEGER,
+                    FOREIGN KEY(account_id) REFERENCES accounts(id),
+                    FOREIGN KEY(voucher_id) REFERENCES vouchers(id)
+                 )''')
+    conn.execute('''INSERT INTO journal_entries_new (id, date, account_id, debit, credit, voucher_id)
+                    SELECT id, date_code(date), account_id, debit, credit, voucher_id FROM journal_entries''')
+
+    conn.execute('''CREATE TABLE balance_snapshots_new (
+                    period_end INTEGER,
+                    account_id INTEGER,
+                    balance INTEGER,
+                    PRIMARY KEY(period_end, account_id),
+                    FOREIGN KEY(account_id) REFERENCES accounts(id)
+                 )''')
+    conn.execute('''INSERT INTO balance_snapshots_new (period_end, account_id, balance)
+                    SELECT date_code(period_end), account_id, balance FROM balance_snapshots''')
+
+    fts = has_table(conn, 'accounts_fts')
+    if fts:
+        conn.execute("DROP TABLE accounts_fts")
+    for table in ['balance_snapshots', 'journal_entries', 'vouchers', 'accounts']:
+        conn.execute(f"DROP TABLE {table}")
+    for table in ['accounts', 'vouchers', 'journal_entries', 'balance_snapshots']:
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    add_indexes(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS journal_entries_voucher ON journal_entries(voucher_id)")
+    if fts:
+        add_account_search_index(conn)
+
+
+def add_archives(conn):
+    # Closed years moved out to their own database files by archive.py; path
+    # is relative to the directory of the main database
+    conn.execute('''CREATE TABLE IF NOT EXISTS archives (
+                    year INTEGER PRIMARY KEY,
+                    path TEXT,
+                    entries INTEGER
+                 )''')
+
+
+def add_balance_verification(conn):
+    # accounts.opening_balance is the part of the balance the live journal does
+    # not explain: the balance an account was created with, entries archived
+    # away and manual adjustments. balance should always equal opening_balance
+    # plus the account's journal total; integrity.py checks that. Existing
+    # balances are taken as correct, so the opening balances are whatever
+    # makes them add up.
+    conn.execute("ALTER TABLE accounts ADD COLUMN opening_balance INTEGER NOT NULL DEFAULT 0")
+    conn.execute('''UPDATE accounts SET opening_balance = balance - COALESCE(
+                        (SELECT SUM(debit - credit) FROM journal_entries WHERE account_id = accounts.id), 0)''')
+
+    # Accounts changed since they were last verified, kept by triggers so an
+    # incremental check only looks at those
+    conn.execute("CREATE TABLE IF NOT EXISTS unverified_accounts (account_id INTEGER PRIMARY KEY) WITHOUT ROWID")
+    conn.execute('''CREATE TRIGGER unverified_journal_insert AFTER INSERT ON journal_entries BEGIN
+                        INSERT OR IGNORE INTO unverified_accounts VALUES (new.account_id);
+                    END''')
+    conn.execute('''CREATE TRIGGER unverified_journal_delete AFTER DELETE ON journal_entries BEGIN
+                        INSERT OR IGNORE INTO unverified_accounts VALUES (old.account_id);
+                    END''')
+    conn.execute('''CREATE TRIGGER unverified_journal_update AFTER UPDATE OF account_id, debit, credit
+                    ON journal_entries BEGIN
+                        INSERT OR IGNORE INTO unverified_accounts VALUES (old.account_id);
+                        INSERT OR IGNORE INTO unverified_accounts VALUES (new.account_id);
+                    END''')
+    conn.execute('''CREATE TRIGGER unverified_account_balance AFTER UPDATE OF balance, opening_balance
+                    ON accounts BEGIN
+                        INSERT OR IGNORE INTO unverified_accounts VALUES (new.id);
+                    END''')
+
+
+# Tables with a stamp in table_stamps
+STAMPED_TABLES = ['accounts', 'balance_snapshots', 'archives']
+
+
+def add_change_stamps(conn):
+    # What cache.py checks cached results against. Triggers give a table a new
+    # stamp on every write to it, and an account a new stamp whenever its
+    # name or balances change. The journal needs no triggers of its own:
+    # every write to it updates the balance or opening balance of each
+    # account it touches in the same transaction, even when the amounts
+    # cancel out, once per account for a whole import rather than once per
+    # line. Stamps are random rather than counted up, so a write that is
+    # rolled back cannot leave a result cached under the stamp the next write
+    # will get.
+    conn.execute('''CREATE TABLE IF NOT EXISTS table_stamps (
+                    name TEXT PRIMARY KEY,
+                    stamp INTEGER NOT NULL
+                 ) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS account_stamps (
+                    account_id INTEGER PRIMARY KEY,
+                    stamp INTEGER NOT NULL
+                 ) WITHOUT ROWID''')
+    for table in STAMPED_TABLES:
+        conn.execute("INSERT OR REPLACE INTO table_stamps VALUES (?, random())", (table,))
+        for event in ['INSERT', 'UPDATE', 'DELETE']:
+            conn.execute(f'''CREATE TRIGGER {table}_stamp_{event.lower()} AFTER {event} ON {table} BEGIN
+                                 UPDATE table_stamps SET stamp = random() WHERE name = '{table}';
+                             END''')
+
+    conn.execute('''CREATE TRIGGER account_stamp_update AFTER UPDATE OF name, balance, opening_balance
+                    ON accounts BEGIN
+                        INSERT OR REPLACE INTO account_stamps VALUES (new.id, random());
+                    END''')
+    conn.execute('''CREATE TRIGGER account_stamp_delete AFTER DELETE ON accounts BEGIN
+                        INSERT OR REPLACE INTO account_stamps VALUES (old.id, random());
+                    END''')
+
+
+MIGRATIONS = [
+    create_tables,
+    add_indexes,
+    add_balance_snapshots,
+    money_to_integer_cents,
+    add_account_search_index,
+    add_vouchers,
+    dates_to_integer_codes,
+    add_archives,
+    add_balance_verification,
+    add_change_stamps,
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    version = schema_version(conn)
+    if version > len(MIGRATIONS):
+        raise RuntimeError(f"Database schema version {version} is newer than this program supports")
+
+    for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def explain_query_plan(conn, query, params=()):
+    return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
@@ -0,0 +1,303 @@
+import io
+import json
+import queue
+import threading
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import accounting
+import archive
+import render
+import reports
+from money import from_cents
+
+
+# Read-only HTTP/JSON API for other services, runnable without a display:
+#
+#   python server.py [DATABASE] [--host 127.0.0.1] [--port 8080] [--pool 8]
+#
+#   GET /accounts?q=&after_id=&before_id=&limit=   accounts by id, or searched
+#   GET /accounts/<id>                   one account
+#   GET /balances?as_of=&type=           balances at the end of a date
+#   GET /journal?after_id=&before_id=&limit=&start_date=&end_date=
+#   GET /ledger?account_id=&start_date=&end_date=&after_id=&before_id=&limit=
+#   GET /reports/<report>?format=json|text|csv|html&as_of=&start=&end=
+#   GET /reports/comparative_balance_sheet?dates=2023-12-31,2024-12-31
+#   GET /reports/comparative_income_statement?period_ends=2024-03-31,2024-06-30,2024-09-30
+#
+# Requests are served by threads from a pool of read-only connections. In WAL
+# mode readers never block the writer (the GUI or an import) or each other.
+# Each request runs in one read transaction, so it sees a single consistent
+# state of the database, with any archived years attached (see archive.py).
+#
+# Every response carries an ETag naming the database generation. The pool
+# keeps one extra connection that only watches PRAGMA data_version, which
+# changes whenever any other connection or process commits; the generation
+# moves on each time the watcher sees a new value. Every request checks the
+# same watcher, so the tag does not depend on which pooled connection serves
+# it. A request whose If-None-Match still names the current generation gets a
+# 304 without touching the database beyond that check.
+
+DEFAULT_POOL_SIZE = 8
+MAX_PAGE_SIZE = 1000
+
+# Report parameters given as comma-separated lists
+LIST_PARAMS = {'dates', 'period_ends'}
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'text': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+}
+
+
+class NotFound(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, db_path, size=DEFAULT_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        # ETags from an earlier run of the server must not match
+        self.instance = uuid.uuid4().hex[:8]
+        self.generation = 0
+        self.watcher = accounting.connect_read_only(db_path, check_same_thread=False)
+        self.version = self.data_version()
+
+    def open(self):
+        with self.lock:
+            if self.created >= self.size:
+                return None
+            self.created += 1
+        return accounting.connect_read_only(self.db_path, check_same_thread=False)
+
+    @contextmanager
+    def connection(self):
+        # Yields (conn, etag) with a read transaction open on conn
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            conn = self.open() or self.idle.get()
+        try:
+            # The ETag is taken before the read starts: a commit in between
+            # then only makes the data newer than its tag, never older
+            etag = self.etag()
+            with archive.history(conn):
+                conn.execute("BEGIN")
+                try:
+                    yield conn, etag
+                finally:
+                    conn.rollback()
+        finally:
+            self.idle.put(conn)
+
+    def data_version(self):
+        return self.watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def etag(self):
+        with self.lock:
+            version = self.data_version()
+            if version != self.version:
+                self.generation += 1
+                self.version = version
+            return f'"{self.instance}-{self.generation}"'
+
+    def close(self):
+        self.watcher.close()
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def int_param(params, name, default=None, minimum=None, maximum=None):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} {value!r}")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return min(value, maximum) if maximum else value
+
+
+def limit_param(params, default):
+    # Page sizes are 1..MAX_PAGE_SIZE; SQLite would read LIMIT -1 as no limit
+    return int_param(params, 'limit', default, 1, MAX_PAGE_SIZE)
+
+
+def account_json(row):
+    account_id, name, account_type, balance, created_date = row
+    return {'id': account_id, 'name': name, 'type': account_type, 'balance': balance,
+            'created_date': created_date}
+
+
+def get_accounts(conn, params):
+    text = params.get('q')
+    limit = limit_param(params, accounting.ACCOUNTS_PAGE_SIZE)
+    if text:
+        rows = accounting.search_accounts(conn, text, limit)
+    else:
+        rows = accounting.get_accounts_page(conn, int_param(params, 'after_id'), int_param(params, 'before_id'),
+                                            limit)
+    return [account_json(row) for row in rows]
+
+
+def get_account(conn, account_id):
+    row = conn.execute("SELECT id, name, type, balance, created_date FROM accounts WHERE id = ?",
+                       (account_id,)).fetchone()
+    if row is None:
+        raise NotFound(f"No account {account_id}")
+    return account_json(accounting.account_row(row))
+
+
+def get_balances(conn, params):
+    as_of = params.get('as_of')
+    if not as_of:
+        raise ValueError("as_of is required")
+    rows = reports.balances_as_of(conn, as_of, params.get('type') or None)
+    return [{'id': account_id, 'name': name, 'type': account_type, 'balance': str(from_cents(balance))}
+            for account_id, name, account_type, balance in rows]
+
+
+def page_params(params):
+    return {'after_id': int_param(params, 'after_id'),
+            'before_id': int_param(params, 'before_id'),
+            'limit': limit_param(params, accounting.JOURNAL_PAGE_SIZE),
+            'start_date': params.get('start_date'),
+            'end_date': params.get('end_date')}
+
+
+def get_journal(conn, params):
+    rows = accounting.get_journal_page(conn, **page_params(params))
+    return [{'id': entry_id, 'date': date, 'account': name, 'debit': debit, 'credit': credit,
+             'voucher_id': voucher_id or None}
+            for entry_id, date, name, debit, credit, voucher_id in rows]
+
+
+def get_ledger(conn, params):
+    rows = accounting.get_ledger_page(conn, int_param(params, 'account_id'), **page_params(params))
+    return [{'id': entry_id, 'date': date, 'account': name, 'debit': debit, 'credit': credit, 'balance': balance}
+            for entry_id, date, name, debit, credit, balance in rows]
+
+
+def get_report(conn, report, params):
+    # (body, content type); the report is rendered by the same streaming code
+    # as the GUI and exports
+    if report not in render.REPORT_PARAMS:
+        raise NotFound(f"No report {report}")
+    format = params.get('format', 'json')
+    if format not in render.SINKS:
+        raise ValueError(f"Invalid format {format!r}")
+    report_params = {name: params[name] for name in render.REPORT_PARAMS[report] if params.get(name)}
+    for name in LIST_PARAMS.intersection(render.REPORT_PARAMS[report]):
+        report_params[name] = [value for value in params.get(name, '').split(',') if value]
+    out = io.StringIO()
+    render.render(conn, report, render.SINKS[format](out), **report_params)
+    return out.getvalue(), CONTENT_TYPES[format]
+
+
+def route(conn, path, params):
+    # (body, content type) for a GET request
+    parts = [part for part in path.split('/') if part]
+    if parts == ['accounts']:
+        data = get_accounts(conn, params)
+    elif len(parts) == 2 and parts[0] == 'accounts':
+        if not parts[1].isdigit():
+            raise NotFound(f"No account {parts[1]}")
+        data = get_account(conn, int(parts[1]))
+    elif parts == ['balances']:
+        data = get_balances(conn, params)
+    elif parts == ['journal']:
+        data = get_journal(conn, params)
+    elif parts == ['ledger']:
+        data = get_ledger(conn, params)
+    elif len(parts) == 2 and parts[0] == 'reports':
+        return get_report(conn, parts[1], params)
+    else:
+        raise NotFound(f"No such resource {path}")
+    return json.dumps(data, default=json_default), CONTENT_TYPES['json']
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'accountsystem'
+    pool = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            with self.pool.connection() as (conn, etag):
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                body, content_type = route(conn, url.path, params)
+        except NotFound as e:
+            return self.send_error_json(404, str(e))
+        except ValueError as e:
+            return self.send_error_json(400, str(e))
+
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message):
+        data = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', CONTENT_TYPES['json'])
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(db_path, host='127.0.0.1', port=8080, pool_size=DEFAULT_POOL_SIZE):
+    # Opening the database once for writing upgrades its schema and puts it
+    # in WAL mode, which the read-only connections cannot do themselves
+    accounting.connect(db_path).close()
+    handler = type('PoolHandler', (Handler,), {'pool': ConnectionPool(db_path, pool_size)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the books read-only as JSON over HTTP")
+    parser.add_argument('database', nargs='?', default=accounting.DEFAULT_DB_PATH)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--pool', type=int, default=DEFAULT_POOL_SIZE, help="read-only connections")
+    args = parser.parse_args()
+
+    httpd = make_server(args.database, args.host, args.port, args.pool)
+    print(f"Serving {args.database} on http://{args.host}:{args.port}/")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        httpd.RequestHandlerClass.pool.close()
@@ -1,621 +1,766 @@
-import tkinter as tk
-from tkinter import ttk
-import sqlite3
-from tkcalendar import DateEntry
-import customtkinter as ctk
-
-
-
-# SQLite Database
-conn = sqlite3.connect('chart_of_accounts.db')
-c = conn.cursor()
-
-# Create table if not exists
-c.execute('''CREATE TABLE IF NOT EXISTS accounts (
-                id INTEGER PRIMARY KEY,
-                name TEXT,
-                type TEXT,
-                balance REAL,
-                created_date TEXT
-             )''')
-
-c.execute('''CREATE TABLE IF NOT EXISTS journal_entries (
-                id INTEGER PRIMARY KEY,
-                date TEXT,
-                account_id INTEGER,
-                debit REAL,
-                credit REAL,
-                FOREIGN KEY(account_id) REFERENCES accounts(id)
-             )''')
-conn.commit()
-
-# Tkinter setup
-root = ctk.CTk()
-root.resizable(False, False)
-
-root.title("E-Accounting System")
-ctk.set_default_color_theme("green")
-
-def add_journal_entry():
-    date = cal_journal.get_date()
-    account_id = list(account_options.keys())[list(account_options.values()).index(accounts_combo.get())]
-    debit = debit_entry.get()
-    credit = credit_entry.get()
-
-    if not (account_id and debit and credit):
-        messagebox.showerror("Error", "Please fill all fields")
-        return
-
-    try:
-        debit = float(debit)
-        credit = float(credit)
-    except ValueError:
-        messagebox.showerror("Error", "Invalid debit or credit amount")
-        return
-
-    if debit <= 0 or credit <= 0:
-        messagebox.showerror("Error", "Debit and Credit should be greater than zero")
-        return
-
-    # Update the journal entries
-    c.execute("INSERT INTO journal_entries (date, account_id, debit, credit) VALUES (?, ?, ?, ?)",
-              (date, account_id, debit, credit))
-    conn.commit()
-
-    # Update the account balances
-    c.execute("UPDATE accounts SET balance = balance + ? WHERE id = ?", (debit - credit, account_id))
-    conn.commit()
-
-    update_journal_treeview()
-    update_treeview()
-
-
-
-
-
-# Function to update journal Treeview
-def update_journal_treeview():
-    journal_tree.delete(*journal_tree.get_children())
-
-    c.execute('''SELECT je.id, je.date, a.name, je.debit, je.credit
-                 FROM journal_entries as je
-                 INNER JOIN accounts as a ON je.account_id = a.id''')
-    rows = c.fetchall()
-
-    for row in rows:
-        journal_tree.insert('', 'end', values=row)
-
-
-
-# Function to add account
-def add_account():
-    name = name_entry.get()
-    type = type_combo.get()
-    balance = balance_entry.get()
-    created_date = cal.get_date()
-
-    c.execute("INSERT INTO accounts (name, type, balance, created_date) VALUES (?, ?, ?, ?)",
-              (name, type, balance, created_date))
-    conn.commit()
-    update_treeview()
-    update_account_options()
-
-
-def update_account_options():
-    # Fetch updated account options
-    c.execute("SELECT id, name FROM accounts")
-    account_rows = c.fetchall()
-    account_options = {str(row[0]): row[1] for row in account_rows}
-
-    # Update the options in the accounts_combo
-    accounts_combo['values'] = list(account_options.values())
-
-
-# Function to update account
-def update_account():
-    selected_item = tree.focus()
-    values = tree.item(selected_item, 'values')
-    account_id = values[0]
-    name = name_entry.get()
-    type = type_combo.get()
-    balance = balance_entry.get()
-    created_date = cal.get_date()
-
-    c.execute("UPDATE accounts SET name=?, type=?, balance=?, created_date=? WHERE id=?",
-              (name, type, balance, created_date, account_id))
-    conn.commit()
-    update_treeview()
-
-# Function to delete account
-def delete_account():
-    selected_item = tree.focus()
-    values = tree.item(selected_item, 'values')
-    account_id = values[0]
-
-    c.execute("DELETE FROM accounts WHERE id=?", (account_id,))
-    conn.commit()
-    update_treeview()
-
-# Function to search account
-def search_account():
-    search_text = search_entry.get()
-    c.execute("SELECT * FROM accounts WHERE name LIKE ?", ('%' + search_text + '%',))
-    rows = c.fetchall()
-    update_treeview(rows)
-
-
-
-def delete_journal_entry():
-    selected_item = journal_tree.focus()
-    values = journal_tree.item(selected_item, 'values')
-    if values:
-        journal_entry_id = values[0]
-        c.execute("DELETE FROM journal_entries WHERE id=?", (journal_entry_id,))
-        conn.commit()
-        update_journal_treeview()
-
-
-# Function to update Treeview
-def update_treeview(rows=None):
-    tree.delete(*tree.get_children())
-
-    if rows is None:
-        c.execute("SELECT * FROM accounts")
-        rows = c.fetchall()
-
-    for row in rows:
-        tree.insert('', 'end', values=row)
-
-
-def generate_balance_sheet():
-    # Fetch accounts and categorize into Asset, Liability, and Equity categories
-    c.execute("SELECT * FROM accounts")
-    accounts = c.fetchall()
-
-    asset_accounts = [acc for acc in accounts if acc[2] == 'Asset']
-    liability_accounts = [acc for acc in accounts if acc[2] == 'Liability']
-    equity_accounts = [acc for acc in accounts if acc[2] == 'Equity']
-
-    # Sort the accounts within each category by their ID
-    asset_accounts.sort(key=lambda x: x[0])
-    liability_accounts.sort(key=lambda x: x[0])
-    equity_accounts.sort(key=lambda x: x[0])
-
-    # Calculate totals for each category
-    total_assets = sum(account[3] for account in asset_accounts)
-    total_liabilities = sum(account[3] for account in liability_accounts)
-    total_equity = sum(account[3] for account in equity_accounts)
-
-    # Generate the balance sheet content
-    balance_sheet_content = f"{'-' * 95}\n{'|':<3}{'ASSETS':^89}{'|':>4}\n{'-' * 95}\n"
-    balance_sheet_content += f"| ID | {'Name':^40} |  Type  | {'Balance':^35} |\n{'-' * 95}\n"
-    for account in asset_accounts:
-        balance_sheet_content += f"| {account[0]:<2} | {account[1]:^40} | {'Asset':^6} | ${account[3]:>30,.2f} |\n"
-    balance_sheet_content += f"{'-' * 95}\n| Total Assets{' ':>69} | ${total_assets:>,.2f}{' ':>25} |\n{'-' * 95}\n\n"
-
-    balance_sheet_content += f"{'-' * 95}\n{'|':<3}{'LIABILITIES':^89}{'|':>4}\n{'-' * 95}\n"
-    balance_sheet_content += f"| ID | {'Name':^40} |  Type  | {'Balance':^35} |\n{'-' * 95}\n"
-    for account in liability_accounts:
-        balance_sheet_content += f"| {account[0]:<2} | {account[1]:^40} | {'Liability':^6} | ${account[3]:>30,.2f} |\n"
-    balance_sheet_content += f"{'-' * 95}\n| Total Liabilities{' ':>55} | ${total_liabilities:>,.2f}{' ':>39} |\n{'-' * 95}\n\n"
-
-    balance_sheet_content += f"{'-' * 95}\n{'|':<3}{'EQUITY':^89}{'|':>4}\n{'-' * 95}\n"
-    balance_sheet_content += f"| ID | {'Name':^40} |  Type  | {'Balance':^35} |\n{'-' * 95}\n"
-    for account in equity_accounts:
-        balance_sheet_content += f"| {account[0]:<2} | {account[1]:^40} | {'Equity':^6} | ${account[3]:>30,.2f} |\n"
-    balance_sheet_content += f"{'-' * 95}\n| Total Equity{' ':>69} | ${total_equity:>,.2f}{' ':>25} |\n{'-' * 95}\n\n"
-
-    balance_sheet_content += f"{'-' * 95}\n| Total Liabilities and Equity{' ':>35} | ${total_liabilities + total_equity:>,.2f}{' ':>59} |\n{'-' * 95}\n"
-
-    # Display the balance sheet in the Balance Sheet tab
-    balance_sheet_text.delete(1.0, tk.END)  # Clear previous content
-    balance_sheet_text.insert(tk.END, balance_sheet_content)
-
-
-
-
-def generate_cash_flow_statement():
-    operating_activities = []
-    investing_activities = []
-    financing_activities = []
-
-    # Retrieve transactions from the journal entries
-    c.execute("SELECT * FROM journal_entries")
-    transactions = c.fetchall()
-
-    # Define criteria for operating, investing, and financing accounts based on account types
-    operating_account_types = ['Income', 'Expense']  # Adjust based on your criteria
-    investing_account_types = ['Asset']  # Adjust based on your criteria
-    financing_account_types = ['Liability', 'Equity']  # Adjust based on your criteria
-
-    for transaction in transactions:
-        account_id = transaction[2]
-        debit_amount = transaction[3]
-        credit_amount = transaction[4]
-
-        # Fetch account type from the 'accounts' table
-        c.execute("SELECT type FROM accounts WHERE id=?", (account_id,))
-        account_type_row = c.fetchone()
-        if account_type_row:
-            account_type = account_type_row[0]
-
-            # Categorize transactions based on account type
-            if account_type in operating_account_types:
-                if debit_amount > 0:
-                    operating_activities.append(debit_amount)
-                elif credit_amount > 0:
-                    operating_activities.append(-credit_amount)
-            elif account_type in investing_account_types:
-                if debit_amount > 0:
-                    investing_activities.append(debit_amount)
-                elif credit_amount > 0:
-                    investing_activities.append(-credit_amount)
-            elif account_type in financing_account_types:
-                if debit_amount > 0:
-                    financing_activities.append(debit_amount)
-                elif credit_amount > 0:
-                    financing_activities.append(-credit_amount)
-
-    # Calculate totals for each category
-    total_operating = sum(operating_activities)
-    total_investing = sum(investing_activities)
-    total_financing = sum(financing_activities)
-
-    # Calculate net cash flow
-    net_cash_flow = total_operating + total_investing + total_financing
-
-    # Generate the cash flow statement content
-    cash_flow_statement_content = f"OPERATING ACTIVITIES: ${total_operating:,.2f}\n"
-    cash_flow_statement_content += f"INVESTING ACTIVITIES: ${total_investing:,.2f}\n"
-    cash_flow_statement_content += f"FINANCING ACTIVITIES: ${total_financing:,.2f}\n\n"
-    cash_flow_statement_content += f"NET CASH FLOW: ${net_cash_flow:,.2f}\n"
-
-    # Display the cash flow statement in the Cash Flow Statement tab
-    cash_flow_statement_text.delete(1.0, tk.END)  # Clear previous content
-    cash_flow_statement_text.insert(tk.END, cash_flow_statement_content)
-
-
-def generate_trial_balance():
-    # Retrieve balances from the accounts table
-    c.execute("SELECT name, balance FROM accounts")
-    accounts_balance = c.fetchall()
-
-    # Initialize variables for total debit and credit
-    total_debit = 0
-    total_credit = 0
-
-    # Calculate total debits and credits separately
-    for _, balance in accounts_balance:
-        if balance > 0:
-            total_debit += balance  # Consider positive balances as debits
-        elif balance < 0:
-            total_credit += abs(balance)  # Consider negative balances as credits
-
-    # Generate the trial balance content
-    trial_balance_content = f"TRIAL BALANCE\n"
-    trial_balance_content += f"{'Account':<20}{'Balance':>15}\n"
-    for account, balance in accounts_balance:
-        trial_balance_content += f"{account:<20}${balance:>15,.2f}\n"
-
-    # Display the totals
-    trial_balance_content += f"\nTotal Debit: ${total_debit:,.2f}\n"
-    trial_balance_content += f"Total Credit: ${total_credit:,.2f}\n"
-
-    # Display the trial balance in the Trial Balance tab
-    trial_balance_text.delete(1.0, tk.END)  # Clear previous content
-    trial_balance_text.insert(tk.END, trial_balance_content)
-
-
-
-
-
-
-def generate_income_statement():
-    income_accounts = []
-    expense_accounts = []
-
-    # Categorize accounts into Income and Expense categories
-    c.execute("SELECT * FROM accounts")
-    accounts = c.fetchall()
-
-    for account in accounts:
-        if account[2] == 'Income':
-            income_accounts.append(account)
-        elif account[2] == 'Expense':
-            expense_accounts.append(account)
-
-    # Calculate totals for each category
-    total_income = sum(account[3] for account in income_accounts)
-    total_expense = sum(account[3] for account in expense_accounts)
-
-    # Calculate net income
-    net_income = total_income - total_expense
-
-    # Generate the income statement content
-    income_statement_content = f"INCOME\n"
-    for account in income_accounts:
-        income_statement_content += f"{account[1]}: ${account[3]:,.2f}\n"
-    income_statement_content += f"Total Income: ${total_income:,.2f}\n\n"
-
-    income_statement_content += f"EXPENSES\n"
-    for account in expense_accounts:
-        income_statement_content += f"{account[1]}: ${account[3]:,.2f}\n"
-    income_statement_content += f"Total Expenses: ${total_expense:,.2f}\n\n"
-
-    income_statement_content += f"NET INCOME: ${net_income:,.2f}\n"
-
-    # Display the income statement in the Income Statement tab
-    income_statement_text.delete(1.0, tk.END)  # Clear previous content
-    income_statement_text.insert(tk.END, income_statement_content)
-
-
-
-
-
-
-
-def on_tree_select(event):
-    selected_item = tree.focus()
-    values = tree.item(selected_item, 'values')
-
-    if values:
-        name_entry.delete(0, tk.END)
-        name_entry.insert(0, values[1])
-        type_combo.set(values[2])
-        balance_entry.delete(0, tk.END)
-        balance_entry.insert(0, values[3])
-        cal.set_date(values[4])
-        try:
-            # Handling date format conversion
-            date_str = values[4]
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            cal.set_date(date_obj.strftime("%m/%d/%Y"))
-        except ValueError:
-            # Display an error message
-            messagebox.showerror("Error", "Invalid date format")
-
-
-
-# Tab setup
-# Create a custom style for the tabs
-style = ttk.Style()
-
-# Configure the tabs' appearance
-style.configure('Custom.TNotebook.Tab', padding=[20, 8], font=('Arial', 12))
-style.map('Custom.TNotebook.Tab', foreground=[('selected', 'black')], background=[('selected', '#DDDDDD')])
-
-# Apply the style to the Notebook (tab_control)
-tab_control = ttk.Notebook(root, style='Custom.TNotebook')
-
-
-tab1 = ttk.Frame(tab_control)
-tab_control.add(tab1, text='Accounts')
-
-
-
-name_label = ctk.CTkLabel(tab1, text='Name:')
-name_label.grid(row=0, column=0, padx=10, pady=5, sticky='w')
-name_entry = ctk.CTkEntry(tab1)
-name_entry.grid(row=0, column=1, padx=10, pady=5)
-
-type_label = ctk.CTkLabel(tab1, text='Type:')
-type_label.grid(row=1, column=0, padx=10, pady=5, sticky='w')
-account_types = ['Asset', 'Liability', 'Equity', 'Income', 'Expense']
-type_combo = ctk.CTkComboBox(tab1, values=account_types)
-type_combo.grid(row=1, column=1, padx=10, pady=5)
-
-balance_label = ctk.CTkLabel(tab1, text='Balance:')
-balance_label.grid(row=2, column=0, padx=10, pady=5, sticky='w')
-balance_entry = ctk.CTkEntry(tab1)
-balance_entry.grid(row=2, column=1, padx=10, pady=5)
-
-date_label = ctk.CTkLabel(tab1, text='Created Date:')
-date_label.grid(row=3, column=0, padx=10, pady=5, sticky='w')
-cal = DateEntry(tab1, width=12, background='darkblue', foreground='white', borderwidth=2)
-cal.grid(row=3, column=1, padx=10, pady=5)
-
-# Buttons
-add_button = ctk.CTkButton(tab1, text='Add Account', command=add_account)
-add_button.grid(row=4, column=0, columnspan=2, padx=10, pady=10)
-
-update_button = ctk.CTkButton(tab1, text='Update Account', command=update_account)
-update_button.grid(row=5, column=0, columnspan=2, padx=10, pady=5)
-
-delete_button = ctk.CTkButton(tab1, text='Delete Account', command=delete_account)
-delete_button.grid(row=6, column=0, columnspan=2, padx=10, pady=5)
-
-# Search
-search_label = ctk.CTkLabel(tab1, text='Search Account:')
-search_label.grid(row=7, column=0, padx=10, pady=5, sticky='w')
-search_entry = ctk.CTkEntry(tab1)
-search_entry.grid(row=7, column=1, padx=10, pady=5)
-search_button = ctk.CTkButton(tab1, text='Search', command=search_account)
-search_button.grid(row=8, column=0, columnspan=2, padx=10, pady=5)
-
-# Treeview
-tree = ttk.Treeview(tab1, columns=('ID', 'Name', 'Type', 'Balance', 'Created Date'), show='headings')
-tree.heading('ID', text='ID')
-tree.heading('Name', text='Name')
-tree.heading('Type', text='Type')
-tree.heading('Balance', text='Balance')
-tree.heading('Created Date', text='Created Date')
-tree.grid(row=0, column=2, rowspan=9, padx=10, pady=10, sticky='nsew')
-
-tree.bind("<<TreeviewSelect>>", on_tree_select)
-
-update_treeview()
-
-# Configure weight of rows and columns to make the UI responsive
-tab1.columnconfigure(2, weight=1)
-tab1.rowconfigure(8, weight=1)
-
-tab_control.pack(expand=1, fill="both")
-
-
-tab2 = ttk.Frame(tab_control)
-tab_control.add(tab2, text='Journal')
-
-# Journal Entry Fields
-journal_label = ctk.CTkLabel(tab2, text='Date:')
-journal_label.grid(row=0, column=0, padx=10, pady=5, sticky='w')
-cal_journal = DateEntry(tab2, width=12, background='darkblue', foreground='white', borderwidth=2)
-cal_journal.grid(row=0, column=1, padx=10, pady=5)
-
-account_label = ctk.CTkLabel(tab2, text='Account:')
-account_label.grid(row=1, column=0, padx=10, pady=5, sticky='w')
-
-# Fetching accounts from the database
-c.execute("SELECT id, name FROM accounts")
-account_rows = c.fetchall()
-account_options = {str(row[0]): row[1] for row in account_rows}
-accounts_combo = ctk.CTkComboBox(tab2, values=list(account_options.values()))
-accounts_combo.grid(row=1, column=1, padx=10, pady=5)
-
-debit_label = ctk.CTkLabel(tab2, text='Debit:')
-debit_label.grid(row=2, column=0, padx=10, pady=5, sticky='w')
-debit_entry = ctk.CTkEntry(tab2)
-debit_entry.grid(row=2, column=1, padx=10, pady=5)
-
-credit_label = ctk.CTkLabel(tab2, text='Credit:')
-credit_label.grid(row=3, column=0, padx=10, pady=5, sticky='w')
-credit_entry = ctk.CTkEntry(tab2)
-credit_entry.grid(row=3, column=1, padx=10, pady=5)
-
-add_journal_button = ctk.CTkButton(tab2, text='Add Entry', command=add_journal_entry)
-add_journal_button.grid(row=4, column=0, columnspan=2, padx=10, pady=10)
-
-delete_journal_button = ctk.CTkButton(tab2, text='Delete Entry', command=delete_journal_entry)
-delete_journal_button.grid(row=5, column=0, columnspan=2, padx=10, pady=5)
-
-
-
-
-# Journal Treeview
-journal_tree = ttk.Treeview(tab2, columns=('ID', 'Date', 'Account', 'Debit', 'Credit'), show='headings')
-journal_tree.heading('ID', text='ID')
-journal_tree.heading('Date', text='Date')
-journal_tree.heading('Account', text='Account')
-journal_tree.heading('Debit', text='Debit')
-journal_tree.heading('Credit', text='Credit')
-journal_tree.grid(row=0, column=2, rowspan=5, padx=10, pady=10, sticky='nsew')
-
-update_journal_treeview()
-
-tab_control.pack(expand=1, fill="both")
-
-# ... (previous code remains unchanged)
-
-tab3 = ttk.Frame(tab_control)
-tab_control.add(tab3, text='Ledger')
-# Add entry widgets for search criteri
-def generate_ledger():
-    # Clear previous entries in the ledger Treeview
-    ledger_tree.delete(*ledger_tree.get_children())
-
-    # Fetch all ledger entries
-    c.execute('''SELECT je.id, je.date, a.name, je.debit, je.credit
-                 FROM journal_entries as je
-                 INNER JOIN accounts as a ON je.account_id = a.id''')
-    ledger_rows = c.fetchall()
-
-    # Display the ledger entries in the ledger Treeview
-    for row in ledger_rows:
-        ledger_tree.insert('', 'end', values=row)
-
-generate_ledger_button = ctk.CTkButton(tab3, text='Generate Ledger', command=generate_ledger)
-generate_ledger_button.grid(row=4, column=0, columnspan=2, padx=10, pady=10)
-
-
-ledger_tree = ttk.Treeview(tab3, columns=('ID', 'Date', 'Account', 'Debit', 'Credit', 'Balance'), show='headings')
-ledger_tree.heading('ID', text='ID')
-ledger_tree.heading('Date', text='Date')
-ledger_tree.heading('Account', text='Account')
-ledger_tree.heading('Debit', text='Debit')
-ledger_tree.heading('Credit', text='Credit')
-ledger_tree.heading('Balance', text='Balance')
-ledger_tree.grid(row=0, column=0, padx=10, pady=10, sticky='nsew')
-
-# ... (previous code remains unchanged)
-
-
-
-
-
-
-
-
-
-
-# Configure column headings and widths
-ledger_tree.heading('ID', text='ID')
-ledger_tree.heading('Date', text='Date')
-ledger_tree.heading('Account', text='Account')
-ledger_tree.heading('Debit', text='Debit')
-ledger_tree.heading('Credit', text='Credit')
-ledger_tree.heading('Balance', text='Balance')
-ledger_tree.column('Debit', anchor='center', width=100)
-ledger_tree.column('Credit', anchor='center', width=100)
-ledger_tree.column('Balance', anchor='center', width=120)
-
-
-
-# Configure weight of rows and columns to make the UI responsive
-tab3.columnconfigure(0, weight=1)
-tab3.rowconfigure(0, weight=1)
-
-tab_control.pack(expand=1, fill="both")
-
-
-tab4 = ttk.Frame(tab_control)
-tab_control.add(tab4, text='Balance Sheet')
-
-# Balance Sheet Text Widget
-balance_sheet_text = tk.Text(tab4, width=100, height=40, font=("Arial", 10))
-balance_sheet_text.pack()
-
-# Generate Balance Sheet Button
-generate_balance_sheet_button = ctk.CTkButton(tab4, text='Generate Balance Sheet', command=generate_balance_sheet)
-generate_balance_sheet_button.pack()
-
-tab5 = ttk.Frame(tab_control)
-tab_control.add(tab5, text='Income Statement')
-
-# Income Statement Text Widget
-income_statement_text = tk.Text(tab5, height=20, width=60)
-income_statement_text.pack()
-
-# Generate Income Statement Button
-generate_income_statement_button = ctk.CTkButton(tab5, text='Generate Income Statement', command=generate_income_statement)
-generate_income_statement_button.pack()
-
-
-tab6 = ttk.Frame(tab_control)
-tab_control.add(tab6, text='Cash Flow Statement')
-
-# Cash Flow Statement Text Widget
-cash_flow_statement_text = tk.Text(tab6, height=20, width=60)
-cash_flow_statement_text.pack()
-
-# Generate Cash Flow Statement Button
-generate_cash_flow_statement_button = ctk.CTkButton(tab6, text='Generate Cash Flow Statement',
-                                                 command=generate_cash_flow_statement)
-generate_cash_flow_statement_button.pack()
-
-
-tab7 = ttk.Frame(tab_control)
-tab_control.add(tab7, text='Trial Balance')
-
-# Trial Balance Text Widget
-trial_balance_text = tk.Text(tab7, height=20, width=60)
-trial_balance_text.pack()
-
-# Generate Trial Balance Button
-generate_trial_balance_button = ctk.CTkButton(tab7, text='Generate Trial Balance', command=generate_trial_balance)
-generate_trial_balance_button.pack()
-
-
-
-root.mainloop()
-
-# Close the database connection on program exit
-conn.close()
+import sys
+import tkinter as tk
+from datetime import datetime
+from tkinter import ttk, messagebox, filedialog
+from tkcalendar import DateEntry
+import customtkinter as ctk
+
+import accounting
+import archive
+import cache
+import importer
+import instrument
+import integrity
+import render
+from directory import AccountDirectory
+from money import from_cents
+from widgets import GroupedTreeview, LazyTabs, PagedTreeview
+from worker import QueryExecutor
+
+
+
+# SQLite Database
+db_path = sys.argv[1] if len(sys.argv) > 1 else accounting.DEFAULT_DB_PATH
+
+# Tkinter setup
+root = ctk.CTk()
+root.resizable(False, False)
+
+root.title("E-Accounting System")
+ctk.set_default_color_theme("green")
+
+
+def show_error(error):
+    messagebox.showerror("Error", str(error))
+
+
+def show_busy(pending):
+    status_label.configure(text='Working...' if pending else '')
+
+
+# Shows when database work is running in the background
+status_frame = ctk.CTkFrame(root, fg_color='transparent')
+# Packed first, at the bottom, so it is there before any job is submitted
+status_frame.pack(side='bottom', fill='x', padx=10)
+status_label = ctk.CTkLabel(status_frame, text='')
+status_label.pack(side='left')
+
+
+# Timings of SQL, background jobs and callbacks, see instrument.py
+def toggle_instrumentation():
+    if instrument_var.get():
+        instrument.enable()
+    else:
+        instrument.disable()
+
+
+def export_timings():
+    path = filedialog.asksaveasfilename(title="Export timings", defaultextension='.json',
+                                        filetypes=[("JSON", "*.json")])
+    if path:
+        instrument.export(path)
+
+
+instrument_var = tk.BooleanVar(value=instrument.enabled)
+instrument_checkbox = ctk.CTkCheckBox(status_frame, text='Record timings', variable=instrument_var,
+                                      command=toggle_instrumentation)
+instrument_checkbox.pack(side='right')
+export_timings_button = ctk.CTkButton(status_frame, text='Export Timings', command=export_timings)
+export_timings_button.pack(side='right', padx=10)
+
+
+# All SQL runs on the executor's worker thread, never on the Tk thread
+executor = QueryExecutor(root, db_path, on_error=show_error, on_busy=show_busy)
+# Reports and ledger pages already shown, reused while nothing has changed;
+# only touched on the worker thread
+report_cache = cache.ResultCache()
+ledger_cache = cache.ResultCache(max_entries=64)
+accounts = AccountDirectory()
+
+
+def refresh_after_posting(_=None):
+    update_journal_treeview()
+    update_treeview()
+
+
+@instrument.timed
+def add_journal_entry():
+    date = cal_journal.get_date()
+    account_id = accounts.id_for(accounts_combo.get())
+    debit = debit_entry.get()
+    credit = credit_entry.get()
+
+    if account_id is None:
+        show_error("Please select an account")
+        return
+
+    executor.submit(lambda conn: accounting.add_journal_entry(conn, date, account_id, debit, credit),
+                    refresh_after_posting)
+
+
+
+
+
+# Lines of the voucher being entered, as (account_id, account name, debit, credit)
+voucher_lines = []
+
+
+@instrument.timed
+def add_voucher_line():
+    name = accounts_combo.get()
+    account_id = accounts.id_for(name)
+    if account_id is None:
+        show_error("Please select an account")
+        return
+    debit = debit_entry.get().strip() or '0'
+    credit = credit_entry.get().strip() or '0'
+    voucher_lines.append((account_id, name, debit, credit))
+    voucher_list.insert(tk.END, f"{name}: Dr {debit} / Cr {credit}")
+    debit_entry.delete(0, tk.END)
+    credit_entry.delete(0, tk.END)
+
+
+def clear_voucher_lines():
+    voucher_lines.clear()
+    voucher_list.delete(0, tk.END)
+    memo_entry.delete(0, tk.END)
+
+
+@instrument.timed
+def post_voucher():
+    date = cal_journal.get_date()
+    memo = memo_entry.get()
+    lines = [(account_id, debit, credit) for account_id, _, debit, credit in voucher_lines]
+
+    def posted(voucher_id):
+        clear_voucher_lines()
+        refresh_after_posting()
+
+    # All lines are validated and posted together, with one refresh
+    executor.submit(lambda conn: accounting.post_voucher(conn, date, lines, memo), posted)
+
+
+@instrument.timed
+def import_journal():
+    path = filedialog.askopenfilename(filetypes=[('Journal files', '*.csv *.jsonl'), ('All files', '*.*')])
+    if not path:
+        return
+
+    def show_progress(count):
+        import_status_label.configure(text=f'{count:,} lines imported')
+
+    def import_failed(error):
+        import_status_label.configure(text='')
+        show_error(error)
+
+    # One refresh for the whole import
+    executor.submit(lambda conn, report: importer.import_journal_file(conn, path, progress=report),
+                    refresh_after_posting, error=import_failed, progress=show_progress)
+
+
+# Function to update journal Treeview
+def update_journal_treeview():
+    # Nothing to do until the Journal tab is first shown, it loads then
+    if tabs.is_built(tab2):
+        journal_view.reload()
+
+
+
+# Function to add account
+@instrument.timed
+def add_account():
+    name = name_entry.get()
+    type = type_combo.get()
+    balance = balance_entry.get()
+    created_date = cal.get_date()
+
+    def added(account_id):
+        accounts.add(account_id, name, type)
+        update_treeview()
+        update_account_combos()
+
+    executor.submit(lambda conn: accounting.add_account(conn, name, type, balance, created_date), added)
+
+
+def load_accounts():
+    # Loads the account directory once, later changes are applied to it directly
+    executor.submit(AccountDirectory.load, set_accounts, key='account_directory')
+
+
+def set_accounts(directory):
+    global accounts
+    accounts = directory
+    update_account_combos()
+
+
+def update_account_combos():
+    # Update the options in the accounts_combo
+    names = accounts.names()
+    if tabs.is_built(tab2):
+        accounts_combo.configure(values=names)
+    if tabs.is_built(tab3):
+        ledger_account_combo.configure(values=[ALL_ACCOUNTS] + names)
+
+
+# Function to update account
+@instrument.timed
+def update_account():
+    selected_item = tree.focus()
+    values = tree.item(selected_item, 'values')
+    account_id = values[0]
+    name = name_entry.get()
+    type = type_combo.get()
+    created_date = cal.get_date()
+
+    def updated(_):
+        accounts.update(account_id, name, type)
+        update_treeview()
+        update_account_combos()
+
+    executor.submit(lambda conn: accounting.update_account(conn, account_id, name, type, created_date), updated)
+
+
+# Function to set an account's balance by hand
+@instrument.timed
+def adjust_balance():
+    selected_item = tree.focus()
+    values = tree.item(selected_item, 'values')
+    account_id = values[0]
+    balance = balance_entry.get()
+    executor.submit(lambda conn: accounting.adjust_balance(conn, account_id, balance), lambda _: update_treeview())
+
+# Function to delete account
+@instrument.timed
+def delete_account():
+    selected_item = tree.focus()
+    values = tree.item(selected_item, 'values')
+    account_id = values[0]
+
+    def deleted(_):
+        accounts.remove(account_id)
+        update_treeview()
+        update_account_combos()
+
+    executor.submit(lambda conn: accounting.delete_account(conn, account_id), deleted)
+
+# Function to search account
+@instrument.timed
+def search_account():
+    search_text = search_entry.get()
+    # Shares its key with update_treeview, so only the newest listing is shown
+    executor.submit(lambda conn: accounting.search_accounts(conn, search_text), fill_treeview, key='accounts')
+
+
+# Type-ahead searches wait for a pause in typing before querying
+SEARCH_DELAY = 200
+pending_searches = {}
+
+def debounce(name, command):
+    if name in pending_searches:
+        root.after_cancel(pending_searches[name])
+    pending_searches[name] = root.after(SEARCH_DELAY, command)
+
+
+@instrument.timed
+def search_as_you_type(event=None):
+    search_text = search_entry.get()
+    if not search_text:
+        debounce('accounts', update_treeview)
+        return
+    debounce('accounts', lambda: executor.submit(
+        lambda conn: accounting.search_accounts(conn, search_text, accounting.SEARCH_LIMIT),
+        fill_treeview, key='accounts'))
+
+
+@instrument.timed
+def filter_accounts_combo(event=None):
+    search_text = accounts_combo.get()
+    if not search_text:
+        accounts_combo.configure(values=accounts.names())
+        return
+
+    def show_matches(rows):
+        accounts_combo.configure(values=[row[1] for row in rows])
+
+    debounce('accounts_combo', lambda: executor.submit(
+        lambda conn: accounting.search_accounts(conn, search_text, accounting.SEARCH_LIMIT),
+        show_matches, key='accounts_combo'))
+
+
+@instrument.timed
+def delete_journal_entry():
+    selected_item = journal_tree.focus()
+    values = journal_tree.item(selected_item, 'values')
+    if values:
+        journal_entry_id = values[0]
+        voucher_id = values[5] if len(values) > 5 else ''
+        if voucher_id:
+            # Voucher lines only go together, with their balance changes
+            if not messagebox.askyesno("Delete Voucher", f"Delete voucher {voucher_id} and all its lines?"):
+                return
+            executor.submit(lambda conn: accounting.delete_voucher(conn, voucher_id), refresh_after_posting)
+        else:
+            executor.submit(lambda conn: accounting.delete_journal_entry(conn, journal_entry_id),
+                            refresh_after_posting)
+
+
+# Function to update Treeview
+def update_treeview(rows=None):
+    if not tabs.is_built(tab1):
+        return
+    if rows is None:
+        # The first page of accounts, the rest is fetched on scroll
+        accounts_view.reload()
+    else:
+        fill_treeview(rows)
+
+
+def fill_treeview(rows):
+    # Search results replace the pages until the next reload
+    accounts_view.show_rows(rows)
+
+
+def show_report(text_widget, report, **params):
+    text_widget.delete(1.0, tk.END)  # Clear previous content
+
+    # The report is rendered on the worker and arrives in chunks. Archived
+    # years are attached so reports reaching back into them stay complete.
+    # Unless the tables the reports read were written since, the chunks from
+    # the last time the report was shown with these parameters are sent again.
+    def render_report(conn, send):
+        key = cache.make_key(report, params)
+        found, chunks = report_cache.lookup(conn, key)
+        if found:
+            for chunk in chunks:
+                send(chunk)
+            return
+
+        chunks = []
+
+        def keep(chunk):
+            chunks.append(chunk)
+            send(chunk)
+
+        with archive.history(conn):
+            render.render_chunks(conn, report, keep, **params)
+        report_cache.store(key, chunks)
+
+    executor.submit(render_report, key=report, progress=lambda chunk: text_widget.insert(tk.END, chunk))
+
+
+@instrument.timed
+def generate_balance_sheet():
+    # Blank date means the live balances
+    as_of = balance_sheet_date_entry.get().strip() or None
+
+    # Display the balance sheet in the Balance Sheet tab
+    show_report(balance_sheet_text, 'balance_sheet', as_of=as_of)
+
+
+@instrument.timed
+def close_period():
+    period_end = balance_sheet_date_entry.get().strip()
+    if not period_end:
+        messagebox.showerror("Error", "Enter the period end date to close")
+        return
+    if not messagebox.askyesno("Close Period", f"Close all periods up to {period_end}? "
+                               "Entries on or before that date can no longer be changed."):
+        return
+
+    executor.submit(lambda conn: accounting.close_period(conn, period_end), lambda _: generate_balance_sheet())
+
+
+@instrument.timed
+def generate_cash_flow_statement():
+    # Display the cash flow statement in the Cash Flow Statement tab
+    show_report(cash_flow_statement_text, 'cash_flow_statement')
+
+
+@instrument.timed
+def generate_trial_balance():
+    # Display the trial balance in the Trial Balance tab
+    show_report(trial_balance_text, 'trial_balance')
+
+
+@instrument.timed
+def generate_income_statement():
+    # Display the income statement in the Income Statement tab
+    show_report(income_statement_text, 'income_statement')
+
+
+
+
+@instrument.timed
+def on_tree_select(event):
+    selected_item = tree.focus()
+    values = tree.item(selected_item, 'values')
+
+    if values:
+        name_entry.delete(0, tk.END)
+        name_entry.insert(0, values[1])
+        type_combo.set(values[2])
+        balance_entry.delete(0, tk.END)
+        balance_entry.insert(0, values[3])
+        # Dates are shown as ISO strings, see dates.py. Dates the upgrade
+        # could not read are NULL, which the Treeview shows as 'None'.
+        if values[4] and values[4] != 'None':
+            try:
+                cal.set_date(datetime.strptime(values[4], '%Y-%m-%d').date())
+            except ValueError:
+                # Display an error message
+                messagebox.showerror("Error", "Invalid date format")
+
+
+
+# Tab setup
+# Create a custom style for the tabs
+style = ttk.Style()
+
+# Configure the tabs' appearance
+style.configure('Custom.TNotebook.Tab', padding=[20, 8], font=('Arial', 12))
+style.map('Custom.TNotebook.Tab', foreground=[('selected', 'black')], background=[('selected', '#DDDDDD')])
+
+# Apply the style to the Notebook (tab_control)
+tab_control = ttk.Notebook(root, style='Custom.TNotebook')
+
+# Each tab's widgets are created, and its data loaded, only when the tab is
+# first selected; functions touching another tab's widgets check that it has
+# been built
+tabs = LazyTabs(tab_control)
+
+
+def build_accounts_tab(tab1):
+    global name_entry, type_combo, balance_entry, cal, search_entry, tree, accounts_view
+
+    name_label = ctk.CTkLabel(tab1, text='Name:')
+    name_label.grid(row=0, column=0, padx=10, pady=5, sticky='w')
+    name_entry = ctk.CTkEntry(tab1)
+    name_entry.grid(row=0, column=1, padx=10, pady=5)
+
+    type_label = ctk.CTkLabel(tab1, text='Type:')
+    type_label.grid(row=1, column=0, padx=10, pady=5, sticky='w')
+    type_combo = ctk.CTkComboBox(tab1, values=accounting.ACCOUNT_TYPES)
+    type_combo.grid(row=1, column=1, padx=10, pady=5)
+
+    balance_label = ctk.CTkLabel(tab1, text='Balance:')
+    balance_label.grid(row=2, column=0, padx=10, pady=5, sticky='w')
+    balance_entry = ctk.CTkEntry(tab1)
+    balance_entry.grid(row=2, column=1, padx=10, pady=5)
+
+    date_label = ctk.CTkLabel(tab1, text='Created Date:')
+    date_label.grid(row=3, column=0, padx=10, pady=5, sticky='w')
+    cal = DateEntry(tab1, width=12, background='darkblue', foreground='white', borderwidth=2)
+    cal.grid(row=3, column=1, padx=10, pady=5)
+
+    # Buttons
+    add_button = ctk.CTkButton(tab1, text='Add Account', command=add_account)
+    add_button.grid(row=4, column=0, columnspan=2, padx=10, pady=10)
+
+    update_button = ctk.CTkButton(tab1, text='Update Account', command=update_account)
+    update_button.grid(row=5, column=0, padx=10, pady=5)
+    adjust_button = ctk.CTkButton(tab1, text='Adjust Balance', command=adjust_balance)
+    adjust_button.grid(row=5, column=1, padx=10, pady=5)
+
+    delete_button = ctk.CTkButton(tab1, text='Delete Account', command=delete_account)
+    delete_button.grid(row=6, column=0, columnspan=2, padx=10, pady=5)
+
+    # Search
+    search_label = ctk.CTkLabel(tab1, text='Search Account:')
+    search_label.grid(row=7, column=0, padx=10, pady=5, sticky='w')
+    search_entry = ctk.CTkEntry(tab1)
+    search_entry.grid(row=7, column=1, padx=10, pady=5)
+    search_entry.bind('<KeyRelease>', search_as_you_type)
+    search_button = ctk.CTkButton(tab1, text='Search', command=search_account)
+    search_button.grid(row=8, column=0, columnspan=2, padx=10, pady=5)
+
+    # Treeview
+    tree = ttk.Treeview(tab1, columns=('ID', 'Name', 'Type', 'Balance', 'Created Date'), show='headings')
+    tree.heading('ID', text='ID')
+    tree.heading('Name', text='Name')
+    tree.heading('Type', text='Type')
+    tree.heading('Balance', text='Balance')
+    tree.heading('Created Date', text='Created Date')
+    tree.grid(row=0, column=2, rowspan=9, padx=10, pady=10, sticky='nsew')
+    accounts_scrollbar = ttk.Scrollbar(tab1, orient='vertical', command=tree.yview)
+    accounts_scrollbar.grid(row=0, column=3, rowspan=9, pady=10, sticky='ns')
+
+    tree.bind("<<TreeviewSelect>>", on_tree_select)
+
+    # Accounts are paged like the journal; shares its key with the searches,
+    # so only the newest listing is shown
+    accounts_view = PagedTreeview(tree, accounting.get_accounts_page, executor, 'accounts',
+                                  scrollbar=accounts_scrollbar)
+    update_treeview()
+
+    # Configure weight of rows and columns to make the UI responsive
+    tab1.columnconfigure(2, weight=1)
+    tab1.rowconfigure(8, weight=1)
+
+
+def voucher_row(line):
+    # Parent row of a voucher's lines in the journal: its date and id
+    return '', line[1], f"Voucher {line[5]}", '', '', line[5]
+
+
+def build_journal_tab(tab2):
+    global cal_journal, accounts_combo, debit_entry, credit_entry, import_status_label, memo_entry, voucher_list
+    global journal_tree, journal_view
+
+    # Journal Entry Fields
+    journal_label = ctk.CTkLabel(tab2, text='Date:')
+    journal_label.grid(row=0, column=0, padx=10, pady=5, sticky='w')
+    cal_journal = DateEntry(tab2, width=12, background='darkblue', foreground='white', borderwidth=2)
+    cal_journal.grid(row=0, column=1, padx=10, pady=5)
+
+    account_label = ctk.CTkLabel(tab2, text='Account:')
+    account_label.grid(row=1, column=0, padx=10, pady=5, sticky='w')
+
+    # Kept up to date by update_account_combos as the accounts load and change
+    accounts_combo = ctk.CTkComboBox(tab2, values=accounts.names())
+    accounts_combo.grid(row=1, column=1, padx=10, pady=5)
+    accounts_combo.bind('<KeyRelease>', filter_accounts_combo)
+
+    debit_label = ctk.CTkLabel(tab2, text='Debit:')
+    debit_label.grid(row=2, column=0, padx=10, pady=5, sticky='w')
+    debit_entry = ctk.CTkEntry(tab2)
+    debit_entry.grid(row=2, column=1, padx=10, pady=5)
+
+    credit_label = ctk.CTkLabel(tab2, text='Credit:')
+    credit_label.grid(row=3, column=0, padx=10, pady=5, sticky='w')
+    credit_entry = ctk.CTkEntry(tab2)
+    credit_entry.grid(row=3, column=1, padx=10, pady=5)
+
+    add_journal_button = ctk.CTkButton(tab2, text='Add Entry', command=add_journal_entry)
+    add_journal_button.grid(row=4, column=0, columnspan=2, padx=10, pady=10)
+
+    delete_journal_button = ctk.CTkButton(tab2, text='Delete Entry', command=delete_journal_entry)
+    delete_journal_button.grid(row=5, column=0, columnspan=2, padx=10, pady=5)
+
+    import_journal_button = ctk.CTkButton(tab2, text='Import Entries', command=import_journal)
+    import_journal_button.grid(row=6, column=0, columnspan=2, padx=10, pady=5)
+    import_status_label = ctk.CTkLabel(tab2, text='')
+    import_status_label.grid(row=7, column=0, columnspan=2, padx=10, pady=5)
+
+    # Vouchers: lines are collected with the Account/Debit/Credit fields above and
+    # posted together as one balanced transaction
+    memo_label = ctk.CTkLabel(tab2, text='Memo:')
+    memo_label.grid(row=8, column=0, padx=10, pady=5, sticky='w')
+    memo_entry = ctk.CTkEntry(tab2)
+    memo_entry.grid(row=8, column=1, padx=10, pady=5)
+
+    add_voucher_line_button = ctk.CTkButton(tab2, text='Add Line', command=add_voucher_line)
+    add_voucher_line_button.grid(row=9, column=0, columnspan=2, padx=10, pady=5)
+
+    voucher_list = tk.Listbox(tab2, height=5, width=40)
+    voucher_list.grid(row=10, column=0, columnspan=2, padx=10, pady=5)
+
+    post_voucher_button = ctk.CTkButton(tab2, text='Post Voucher', command=post_voucher)
+    post_voucher_button.grid(row=11, column=0, padx=10, pady=5)
+    clear_voucher_button = ctk.CTkButton(tab2, text='Clear Lines', command=clear_voucher_lines)
+    clear_voucher_button.grid(row=11, column=1, padx=10, pady=5)
+
+    # Journal Treeview
+    journal_tree = ttk.Treeview(tab2, columns=('ID', 'Date', 'Account', 'Debit', 'Credit', 'Voucher'),
+                                show='tree headings')
+    journal_tree.column('#0', width=30, stretch=False)
+    journal_tree.heading('ID', text='ID')
+    journal_tree.heading('Date', text='Date')
+    journal_tree.heading('Account', text='Account')
+    journal_tree.heading('Debit', text='Debit')
+    journal_tree.heading('Credit', text='Credit')
+    journal_tree.heading('Voucher', text='Voucher')
+    journal_tree.column('Voucher', width=70)
+    journal_tree.grid(row=0, column=2, rowspan=12, padx=10, pady=10, sticky='nsew')
+    journal_scrollbar = ttk.Scrollbar(tab2, orient='vertical', command=journal_tree.yview)
+    journal_scrollbar.grid(row=0, column=3, rowspan=12, pady=10, sticky='ns')
+
+    # Only a window of the journal is kept in the Treeview, more is fetched on
+    # scroll. The lines of a voucher are grouped under a row for the voucher;
+    # selecting that row and deleting removes the whole voucher.
+    journal_view = GroupedTreeview(journal_tree, accounting.get_journal_page, executor, 'journal_page',
+                                   group_column=5, group_row=voucher_row, scrollbar=journal_scrollbar)
+
+    update_journal_treeview()
+
+
+ALL_ACCOUNTS = 'All Accounts'
+ledger_filters = {}
+
+@instrument.timed
+def generate_ledger():
+    global ledger_filters
+    filters = {}
+    selected = ledger_account_combo.get()
+    if selected != ALL_ACCOUNTS:
+        account_id = accounts.id_for(selected)
+        if account_id is None:
+            messagebox.showerror("Error", "Unknown account")
+            return
+        filters['account_id'] = account_id
+    filters['start_date'] = ledger_from_entry.get().strip() or None
+    filters['end_date'] = ledger_to_entry.get().strip() or None
+    # Replaced rather than updated, page fetches read it on the worker thread
+    ledger_filters = filters
+
+    # Display the first page of ledger entries, the rest is fetched on scroll
+    ledger_view.reload()
+
+
+def fetch_ledger_page(conn, **page):
+    filters = ledger_filters
+    # A page of one account stays cached until that account is written to
+    return ledger_cache.get(conn, cache.make_key('ledger', dict(filters, **page)),
+                            lambda: accounting.get_ledger_page(conn, **filters, **page),
+                            cache.LEDGER_TABLES, filters.get('account_id'))
+
+
+def build_ledger_tab(tab3):
+    global ledger_account_combo, ledger_from_entry, ledger_to_entry, ledger_view
+
+    # Add entry widgets for search criteria
+    ledger_filter_frame = ctk.CTkFrame(tab3)
+    ledger_filter_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=5, sticky='w')
+
+    ledger_account_label = ctk.CTkLabel(ledger_filter_frame, text='Account:')
+    ledger_account_label.grid(row=0, column=0, padx=10, pady=5, sticky='w')
+    ledger_account_combo = ctk.CTkComboBox(ledger_filter_frame, values=[ALL_ACCOUNTS] + accounts.names())
+    ledger_account_combo.set(ALL_ACCOUNTS)
+    ledger_account_combo.grid(row=0, column=1, padx=10, pady=5)
+
+    ledger_from_label = ctk.CTkLabel(ledger_filter_frame, text='From:')
+    ledger_from_label.grid(row=0, column=2, padx=10, pady=5, sticky='w')
+    ledger_from_entry = ctk.CTkEntry(ledger_filter_frame, placeholder_text='YYYY-MM-DD')
+    ledger_from_entry.grid(row=0, column=3, padx=10, pady=5)
+
+    ledger_to_label = ctk.CTkLabel(ledger_filter_frame, text='To:')
+    ledger_to_label.grid(row=0, column=4, padx=10, pady=5, sticky='w')
+    ledger_to_entry = ctk.CTkEntry(ledger_filter_frame, placeholder_text='YYYY-MM-DD')
+    ledger_to_entry.grid(row=0, column=5, padx=10, pady=5)
+
+    generate_ledger_button = ctk.CTkButton(tab3, text='Generate Ledger', command=generate_ledger)
+    generate_ledger_button.grid(row=4, column=0, columnspan=2, padx=10, pady=10)
+
+    ledger_tree = ttk.Treeview(tab3, columns=('ID', 'Date', 'Account', 'Debit', 'Credit', 'Balance'),
+                               show='headings')
+    # Configure column headings and widths
+    ledger_tree.heading('ID', text='ID')
+    ledger_tree.heading('Date', text='Date')
+    ledger_tree.heading('Account', text='Account')
+    ledger_tree.heading('Debit', text='Debit')
+    ledger_tree.heading('Credit', text='Credit')
+    ledger_tree.heading('Balance', text='Balance')
+    ledger_tree.column('Debit', anchor='center', width=100)
+    ledger_tree.column('Credit', anchor='center', width=100)
+    ledger_tree.column('Balance', anchor='center', width=120)
+    ledger_tree.grid(row=0, column=0, padx=10, pady=10, sticky='nsew')
+    ledger_scrollbar = ttk.Scrollbar(tab3, orient='vertical', command=ledger_tree.yview)
+    ledger_scrollbar.grid(row=0, column=1, pady=10, sticky='ns')
+
+    ledger_view = PagedTreeview(ledger_tree, fetch_ledger_page, executor, 'ledger_page', scrollbar=ledger_scrollbar)
+
+    # Configure weight of rows and columns to make the UI responsive
+    tab3.columnconfigure(0, weight=1)
+    tab3.rowconfigure(0, weight=1)
+
+
+def build_balance_sheet_tab(tab4):
+    global balance_sheet_text, balance_sheet_date_entry
+
+    # Balance Sheet Text Widget
+    balance_sheet_text = tk.Text(tab4, width=100, height=40, font=("Arial", 10))
+    balance_sheet_text.pack()
+
+    # As-of date for the balance sheet and period close
+    balance_sheet_date_entry = ctk.CTkEntry(tab4, placeholder_text='As of YYYY-MM-DD')
+    balance_sheet_date_entry.pack(pady=5)
+
+    # Generate Balance Sheet Button
+    generate_balance_sheet_button = ctk.CTkButton(tab4, text='Generate Balance Sheet', command=generate_balance_sheet)
+    generate_balance_sheet_button.pack()
+
+    close_period_button = ctk.CTkButton(tab4, text='Close Period', command=close_period)
+    close_period_button.pack(pady=5)
+
+
+def build_income_statement_tab(tab5):
+    global income_statement_text
+
+    # Income Statement Text Widget
+    income_statement_text = tk.Text(tab5, height=20, width=60)
+    income_statement_text.pack()
+
+    # Generate Income Statement Button
+    generate_income_statement_button = ctk.CTkButton(tab5, text='Generate Income Statement',
+                                                     command=generate_income_statement)
+    generate_income_statement_button.pack()
+
+
+def build_cash_flow_statement_tab(tab6):
+    global cash_flow_statement_text
+
+    # Cash Flow Statement Text Widget
+    cash_flow_statement_text = tk.Text(tab6, height=20, width=60)
+    cash_flow_statement_text.pack()
+
+    # Generate Cash Flow Statement Button
+    generate_cash_flow_statement_button = ctk.CTkButton(tab6, text='Generate Cash Flow Statement',
+                                                        command=generate_cash_flow_statement)
+    generate_cash_flow_statement_button.pack()
+
+
+def build_trial_balance_tab(tab7):
+    global trial_balance_text
+
+    # Trial Balance Text Widget
+    trial_balance_text = tk.Text(tab7, height=20, width=60)
+    trial_balance_text.pack()
+
+    # Generate Trial Balance Button
+    generate_trial_balance_button = ctk.CTkButton(tab7, text='Generate Trial Balance',
+                                                  command=generate_trial_balance)
+    generate_trial_balance_button.pack()
+
+
+tab1 = ttk.Frame(tab_control)
+tabs.add(tab1, 'Accounts', build_accounts_tab)
+tab2 = ttk.Frame(tab_control)
+tabs.add(tab2, 'Journal', build_journal_tab)
+tab3 = ttk.Frame(tab_control)
+tabs.add(tab3, 'Ledger', build_ledger_tab)
+tab4 = ttk.Frame(tab_control)
+tabs.add(tab4, 'Balance Sheet', build_balance_sheet_tab)
+tab5 = ttk.Frame(tab_control)
+tabs.add(tab5, 'Income Statement', build_income_statement_tab)
+tab6 = ttk.Frame(tab_control)
+tabs.add(tab6, 'Cash Flow Statement', build_cash_flow_statement_tab)
+tab7 = ttk.Frame(tab_control)
+tabs.add(tab7, 'Trial Balance', build_trial_balance_tab)
+
+tab_control.pack(expand=1, fill="both")
+
+# Balances changed since the last run are checked against the journal in the
+# background at startup, see integrity.py
+def balances_verified(discrepancies):
+    if not discrepancies:
+        return
+    names = '\n'.join(f"{name}: {from_cents(stored)} stored, {from_cents(expected)} in the journal"
+                      for _, name, stored, expected in discrepancies[:10])
+    more = f"\n...and {len(discrepancies) - 10} more" if len(discrepancies) > 10 else ''
+    if messagebox.askyesno("Balance Check", f"{len(discrepancies)} account balances do not match the journal:\n"
+                           f"{names}{more}\n\nSet them to the journal balances?"):
+        account_ids = [row[0] for row in discrepancies]
+        executor.submit(lambda conn: integrity.repair(conn, account_ids), lambda _: update_treeview())
+
+
+# Startup only queues work: the worker runs the first page of accounts for
+# the Accounts tab, shown first, then the account directory and the balance
+# check, while the window is already up. The status bar exists by now, as the
+# executor reports every submission to it.
+tabs.build(tab1)
+load_accounts()
+executor.submit(lambda conn: integrity.verify(conn, incremental=True), balances_verified, key='verify')
+
+root.mainloop()
+
+# Close the database connection on program exit
+executor.close()
@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+import accounting
+import archive
+import integrity
+import render
+
+
+@pytest.fixture
+def book(tmp_path):
+    conn = accounting.connect(str(tmp_path / 'books.db'))
+    cash = accounting.add_account(conn, 'Cash', 'Asset', '0', '2021-01-01')
+    sales = accounting.add_account(conn, 'Sales', 'Income', '0', '2021-01-01')
+    accounting.post_voucher(conn, '2021-03-01', [(cash, '10', '0'), (sales, '0', '10')], memo='March')
+    accounting.post_voucher(conn, '2021-08-01', [(cash, '100', '0'), (sales, '0', '100')], memo='August')
+    accounting.close_period(conn, '2021-12-31')
+    accounting.post_voucher(conn, '2022-02-01', [(cash, '5', '0'), (sales, '0', '5')], memo='February')
+    yield conn, cash, sales
+    conn.close()
+
+
+def reports(conn):
+    return [accounting.generate_trial_balance(conn, as_of='2021-05-30'),
+            accounting.generate_balance_sheet(conn, as_of='2021-05-30'),
+            accounting.generate_income_statement(conn, start='2021-01-01', end='2021-12-31'),
+            accounting.generate_cash_flow_statement(conn)]
+
+
+def test_archive_year_moves_entries_out_of_the_live_file(book, tmp_path):
+    conn, cash, sales = book
+    assert archive.archive_year(conn, 2021) == 4
+
+    assert conn.execute("SELECT date FROM journal_entries").fetchall() == [(20220201,), (20220201,)]
+    assert conn.execute("SELECT memo FROM vouchers").fetchall() == [('February',)]
+    assert archive.get_archives(conn) == [(2021, 'books_2021.db', 4)]
+    archived = sqlite3.connect(str(tmp_path / 'books_2021.db'))
+    assert archived.execute("SELECT COUNT(*) FROM journal_entries").fetchone() == (4,)
+    assert archived.execute("SELECT memo FROM vouchers ORDER BY id").fetchall() == [('March',), ('August',)]
+    archived.close()
+
+    # Running it again moves nothing
+    assert archive.archive_year(conn, 2021) == 0
+
+
+def test_archived_totals_carry_into_opening_balances(book):
+    conn, cash, sales = book
+    archive.archive_year(conn, 2021)
+    rows = conn.execute("SELECT id, balance, opening_balance FROM accounts ORDER BY id").fetchall()
+    assert rows == [(cash, 11500, 11000), (sales, -11500, -11000)]
+    assert integrity.verify(conn) == []
+
+
+def test_reports_read_archived_years_through_history(book):
+    conn, cash, sales = book
+    before = reports(conn)
+    archive.archive_year(conn, 2021)
+
+    assert reports(conn) == before
+    assert '$10.00' in before[0]
+    # The live file alone no longer has 2021's entries
+    assert render.render_text(conn, 'cash_flow_statement') != before[3]
+    with archive.history(conn):
+        assert render.render_text(conn, 'cash_flow_statement') == before[3]
+
+
+def test_archiving_an_open_year_is_refused(book):
+    conn, cash, sales = book
+    with pytest.raises(ValueError):
+        archive.archive_year(conn, 2022)
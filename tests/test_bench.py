@@ -0,0 +1,14 @@
+import accounting
+import bench
+
+
+def test_every_benchmark_runs(tmp_path):
+    conn = accounting.connect(str(tmp_path / 'bench.db'))
+    bench.generate(conn, 500, accounts=20, days=60)
+    names = []
+    for name, func in bench.benchmarks(conn, posts=2):
+        func()
+        names.append(name)
+    assert 'report_comparative_balance_sheet' in names
+    assert 'report_comparative_income_statement' in names
+    conn.close()
@@ -0,0 +1,88 @@
+import pytest
+
+import accounting
+import analytics
+import cache
+import render
+
+
+@pytest.fixture
+def book(tmp_path):
+    conn = accounting.connect(str(tmp_path / 'books.db'))
+    cash = accounting.add_account(conn, 'Cash', 'Asset', '0', '2024-01-01')
+    bank = accounting.add_account(conn, 'Bank', 'Asset', '0', '2024-01-01')
+    sales = accounting.add_account(conn, 'Sales', 'Income', '0', '2024-01-01')
+    accounting.post_voucher(conn, '2024-05-10', [(cash, '300', '0'), (sales, '0', '300')])
+    accounting.post_voucher(conn, '2024-05-11', [(bank, '200', '0'), (sales, '0', '200')])
+    yield conn, cash, bank, sales
+    conn.close()
+
+
+def cached_ledger(ledger_cache, conn, account_id, computed):
+    def compute():
+        computed.append(account_id)
+        return accounting.get_ledger_page(conn, account_id)
+    return ledger_cache.get(conn, cache.make_key('ledger', {'account_id': account_id}), compute,
+                            cache.LEDGER_TABLES, account_id)
+
+
+def test_posting_only_invalidates_what_it_touched(book):
+    conn, cash, bank, sales = book
+    ledger_cache = cache.ResultCache()
+    report_cache = cache.ResultCache()
+    computed = []
+    key = cache.make_key('trial_balance', {})
+
+    for account_id in (cash, bank):
+        cached_ledger(ledger_cache, conn, account_id, computed)
+    report_cache.get(conn, key, lambda: render.render_text(conn, 'trial_balance'))
+    accounting.post_voucher(conn, '2024-05-12', [(cash, '50', '0'), (sales, '0', '50')])
+
+    assert len(cached_ledger(ledger_cache, conn, cash, computed)) == 2
+    cached_ledger(ledger_cache, conn, bank, computed)
+    assert computed == [cash, bank, cash]
+    assert report_cache.lookup(conn, key) == (False, None)
+
+
+def test_commits_from_other_connections_invalidate(book, tmp_path):
+    conn, cash, bank, sales = book
+    ledger_cache = cache.ResultCache()
+    computed = []
+    cached_ledger(ledger_cache, conn, bank, computed)
+
+    other = accounting.connect(str(tmp_path / 'books.db'))
+    accounting.post_voucher(other, '2024-05-12', [(bank, '10', '0'), (sales, '0', '10')])
+    other.close()
+
+    assert len(cached_ledger(ledger_cache, conn, bank, computed)) == 2
+    assert computed == [bank, bank]
+
+
+def test_rolled_back_write_does_not_validate_a_result(book):
+    conn, cash, bank, sales = book
+    report_cache = cache.ResultCache()
+    key = cache.make_key('trial_balance', {})
+
+    conn.execute("BEGIN")
+    conn.execute("UPDATE accounts SET name = 'Petty cash' WHERE id = ?", (cash,))
+    report_cache.get(conn, key, lambda: render.render_text(conn, 'trial_balance'))
+    conn.rollback()
+    accounting.update_account(conn, bank, 'Savings', 'Asset', '2024-01-01')
+
+    found, _ = report_cache.lookup(conn, key)
+    assert not found
+
+
+def test_voucher_that_nets_to_zero_invalidates(book):
+    pytest.importorskip('numpy')
+    conn, cash, bank, sales = book
+    ledger_cache = cache.ResultCache()
+    computed = []
+    cached_ledger(ledger_cache, conn, cash, computed)
+    snap = analytics.snapshot(conn)
+
+    accounting.post_voucher(conn, '2024-05-12', [(cash, '50', '0'), (cash, '0', '50')])
+
+    assert len(cached_ledger(ledger_cache, conn, cash, computed)) == 3
+    assert computed == [cash, cash]
+    assert len(analytics.snapshot(conn)) == len(snap) + 2
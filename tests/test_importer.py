@@ -0,0 +1,79 @@
+import pytest
+
+import accounting
+import archive
+import importer
+
+
+@pytest.fixture
+def book():
+    conn = accounting.connect(':memory:')
+    cash = accounting.add_account(conn, 'Cash', 'Asset', '100', '2024-01-01')
+    sales = accounting.add_account(conn, 'Sales', 'Income', '0', '2024-01-01')
+    yield conn, cash, sales
+    conn.close()
+
+
+def balances(conn):
+    return conn.execute("SELECT id, balance FROM accounts ORDER BY id").fetchall()
+
+
+def entries(conn):
+    return conn.execute("SELECT date, account_id, debit, credit FROM journal_entries ORDER BY id").fetchall()
+
+
+def test_balances_are_netted_into_one_update_per_account(book):
+    conn, cash, sales = book
+    rows = [{'date': '2024-02-01', 'account_id': cash, 'debit': '10', 'credit': '0'},
+            {'date': '2024-02-02', 'account': 'Sales', 'debit': '0', 'credit': '10'},
+            {'date': '2024-02-03', 'account': 'Cash', 'debit': '2.50', 'credit': ''},
+            {'date': '2024-02-04', 'account_id': str(sales), 'debit': '', 'credit': '2.50'},
+            {'date': '2024-02-05', 'account_id': cash, 'debit': '0', 'credit': '1'}]
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert importer.import_journal(conn, rows, batch_size=2) == 5
+    conn.set_trace_callback(None)
+
+    assert balances(conn) == [(cash, 10000 + 1000 + 250 - 100), (sales, -1250)]
+    # The trace repeats a statement for each trigger it fires
+    assert {sql for sql in statements if sql.startswith("UPDATE accounts SET balance")} == {
+        f"UPDATE accounts SET balance = balance + 1150 WHERE id = {cash}",
+        f"UPDATE accounts SET balance = balance + -1250 WHERE id = {sales}"}
+
+
+def test_validation_error_rolls_back_the_whole_import(book):
+    conn, cash, sales = book
+    rows = [{'date': '2024-02-01', 'account_id': cash, 'debit': '10', 'credit': '0'},
+            {'date': '2024-02-02', 'account_id': sales, 'debit': '0', 'credit': '10'},
+            {'date': '2024-02-03', 'account': 'Bank', 'debit': '5', 'credit': '0'}]
+    with pytest.raises(importer.JournalImportError) as error:
+        importer.import_journal(conn, rows, batch_size=1)
+
+    assert error.value.line == 3
+    assert entries(conn) == []
+    assert balances(conn) == [(cash, 10000), (sales, 0)]
+
+
+def test_dates_in_a_closed_period_are_rejected(book):
+    conn, cash, sales = book
+    accounting.close_period(conn, '2024-01-31')
+    with pytest.raises(importer.JournalImportError, match="closed period"):
+        importer.import_journal(conn, [{'date': '2024-01-31', 'account_id': cash, 'debit': '1', 'credit': '0'}])
+    assert importer.import_journal(conn, [{'date': '2024-02-01', 'account_id': cash, 'debit': '1', 'credit': '0'}]) == 1
+
+
+@pytest.mark.parametrize('format', ['csv', 'jsonl'])
+def test_exported_journal_imports_back(book, tmp_path, format):
+    conn, cash, sales = book
+    accounting.post_voucher(conn, '2024-02-01', [(cash, '12.34', '0'), (sales, '0', '12.34')])
+    accounting.add_journal_entry(conn, '2024-03-01', cash, '5', '7.50')
+    path = str(tmp_path / f'journal.{format}')
+    assert archive.export_journal(conn, path, format=format) == 3
+
+    copy = accounting.connect(':memory:')
+    accounting.add_account(copy, 'Cash', 'Asset', '100', '2024-01-01')
+    accounting.add_account(copy, 'Sales', 'Income', '0', '2024-01-01')
+    assert importer.import_journal_file(copy, path) == 3
+    assert entries(copy) == entries(conn)
+    assert balances(copy) == balances(conn)
+    copy.close()
@@ -0,0 +1,45 @@
+import pytest
+
+import accounting
+import integrity
+
+
+@pytest.fixture
+def book():
+    conn = accounting.connect(':memory:')
+    cash = accounting.add_account(conn, 'Cash', 'Asset', '100', '2024-01-01')
+    accounting.add_journal_entry(conn, '2024-02-01', cash, '60', '10')
+    integrity.verify(conn)
+    yield conn, cash
+    conn.close()
+
+
+def balance(conn, account_id):
+    return conn.execute("SELECT balance, opening_balance FROM accounts WHERE id = ?", (account_id,)).fetchone()
+
+
+def test_updating_an_account_keeps_its_balance(book):
+    conn, cash = book
+    accounting.update_account(conn, cash, 'Petty cash', 'Asset', '2024-01-01')
+    assert balance(conn, cash) == (15000, 10000)
+    assert integrity.verify(conn, incremental=True) == []
+
+
+def test_overwritten_balance_is_caught_and_repaired(book):
+    conn, cash = book
+    with conn:
+        conn.execute("UPDATE accounts SET balance = 10000 WHERE id = ?", (cash,))
+
+    assert integrity.verify(conn, incremental=True) == [(cash, 'Cash', 10000, 15000)]
+    assert integrity.pending(conn) == 1
+    assert integrity.repair(conn) == [(cash, 'Cash', 10000, 15000)]
+    assert balance(conn, cash) == (15000, 10000)
+    assert integrity.verify(conn) == []
+    assert integrity.pending(conn) == 0
+
+
+def test_adjusting_a_balance_moves_the_opening_balance(book):
+    conn, cash = book
+    accounting.adjust_balance(conn, cash, '120')
+    assert balance(conn, cash) == (12000, 7000)
+    assert integrity.verify(conn, incremental=True) == []
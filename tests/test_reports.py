@@ -0,0 +1,111 @@
+import io
+import os
+import subprocess
+import sys
+import json
+
+import pytest
+
+import accounting
+import render
+
+
+@pytest.fixture
+def book():
+    conn = accounting.connect(':memory:')
+    cash = accounting.add_account(conn, 'Cash', 'Asset', '0', '2024-01-01')
+    loan = accounting.add_account(conn, 'Loan', 'Liability', '0', '2024-01-01')
+    sales = accounting.add_account(conn, 'Sales', 'Income', '0', '2024-01-01')
+    rent = accounting.add_account(conn, 'Rent', 'Expense', '0', '2024-01-01')
+    accounting.post_voucher(conn, '2024-02-10', [(cash, '1000', '0'), (loan, '0', '1000')])
+    accounting.post_voucher(conn, '2024-05-10', [(cash, '300', '0'), (sales, '0', '300')])
+    accounting.post_voucher(conn, '2024-08-10', [(rent, '120', '0'), (cash, '0', '120')])
+    accounting.post_voucher(conn, '2024-08-20', [(cash, '50', '0'), (sales, '0', '50')])
+    yield conn
+    conn.close()
+
+
+def render_json(conn, report, **params):
+    out = io.StringIO()
+    render.render(conn, report, render.JsonSink(out), **params)
+    return json.loads(out.getvalue())
+
+
+def section_rows(report):
+    return {section['title']: section['rows'] for section in report['sections']}
+
+
+def test_comparative_balance_sheet_matches_single_dates(book):
+    dates = ['2024-03-31', '2024-06-30', '2024-09-30']
+    report = section_rows(render_json(book, 'comparative_balance_sheet', dates=dates))
+    for column, as_of in enumerate(dates, 2):
+        single = section_rows(render_json(book, 'balance_sheet', as_of=as_of))
+        for title, rows in single.items():
+            accounts = [row for row in report[title] if row[0] != '']
+            assert [row[3] for row in rows] == [row[column] for row in accounts]
+    assert report['ASSETS'][-1] == ['', 'Total Assets', '1000.00', '1300.00', '1230.00']
+    assert report['EQUITY'][-1] == ['', 'Total Liabilities and Equity', '-1000.00', '-1000.00', '-1000.00']
+
+
+def income_totals(book, **params):
+    report = render_json(book, 'income_statement', **params)
+    return {total['label']: total['amount'] for section in report['sections'] for total in section['totals']}
+
+
+def test_income_statement_includes_both_end_dates(book):
+    totals = income_totals(book, start='2024-05-10', end='2024-08-10')
+    assert totals == {'Total Income': '-300.00', 'Total Expenses': '120.00', 'NET INCOME': '-420.00'}
+
+
+def test_income_statement_from_a_start_date_runs_to_date(book):
+    totals = income_totals(book, start='2024-08-10')
+    assert totals == {'Total Income': '-50.00', 'Total Expenses': '120.00', 'NET INCOME': '-170.00'}
+    assert render_json(book, 'income_statement', start='2024-08-10')['title'] == 'INCOME STATEMENT 2024-08-10 TO ...'
+
+
+def test_comparative_income_statement_has_one_column_per_period(book):
+    report = render_json(book, 'comparative_income_statement',
+                         period_ends=['2024-03-31', '2024-06-30', '2024-09-30'])
+    rows = section_rows(report)
+    assert [section['columns'][2:] for section in report['sections']][0] == [
+        '2024-03-31 to 2024-06-30', '2024-06-30 to 2024-09-30']
+    assert rows['INCOME'] == [[3, 'Sales', '-300.00', '-50.00'], ['', 'Total Income', '-300.00', '-50.00']]
+    assert rows['EXPENSES'][-2:] == [['', 'Total Expenses', '0.00', '120.00'], ['', 'NET INCOME', '-300.00', '-170.00']]
+
+
+def test_comparative_income_statement_needs_two_period_ends(book):
+    with pytest.raises(ValueError):
+        render_json(book, 'comparative_income_statement', period_ends=['2024-03-31'])
+
+
+def run_render(tmp_path, *args):
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.run([sys.executable, os.path.join(repo, 'render.py'), *args,
+                           '--db', str(tmp_path / 'books.db')], capture_output=True, text=True)
+
+
+def test_render_cli_passes_each_report_its_own_parameters(tmp_path):
+    conn = accounting.connect(str(tmp_path / 'books.db'))
+    cash = accounting.add_account(conn, 'Cash', 'Asset', '0', '2024-01-01')
+    sales = accounting.add_account(conn, 'Sales', 'Income', '0', '2024-01-01')
+    accounting.post_voucher(conn, '2024-05-10', [(cash, '300', '0'), (sales, '0', '300')])
+    accounting.post_voucher(conn, '2024-08-10', [(cash, '50', '0'), (sales, '0', '50')])
+    conn.close()
+    output = tmp_path / 'income.json'
+
+    result = run_render(tmp_path, 'income_statement', str(output), '--format', 'json',
+                        '--start', '2024-08-10', '--end', '2024-12-31')
+    assert result.returncode == 0, result.stderr
+    report = json.loads(output.read_text())
+    assert section_rows(report)['INCOME'] == [[sales, 'Sales', 'Income', '-50.00']]
+
+    result = run_render(tmp_path, 'income_statement', str(output), '--as-of', '2024-12-31')
+    assert result.returncode == 2
+    assert 'income_statement does not take --as-of' in result.stderr
+
+
+def test_render_cli_asks_for_the_dates_a_report_needs(tmp_path):
+    accounting.connect(str(tmp_path / 'books.db')).close()
+    result = run_render(tmp_path, 'comparative_balance_sheet', str(tmp_path / 'out.txt'))
+    assert result.returncode == 2
+    assert 'comparative_balance_sheet needs --dates' in result.stderr
@@ -0,0 +1,181 @@
+import sqlite3
+
+import pytest
+
+import accounting
+import integrity
+import reports
+import schema
+
+
+# Schema migrations and index use. Old databases are built the way the
+# original program (or an earlier schema version) wrote them and upgraded in
+# place with accounting.connect.
+
+BASELINE_TABLES = ['''CREATE TABLE IF NOT EXISTS accounts (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT,
+                        type TEXT,
+                        balance REAL,
+                        created_date TEXT
+                     )''',
+                   '''CREATE TABLE IF NOT EXISTS journal_entries (
+                        id INTEGER PRIMARY KEY,
+                        date TEXT,
+                        account_id INTEGER,
+                        debit REAL,
+                        credit REAL,
+                        FOREIGN KEY(account_id) REFERENCES accounts(id)
+                     )''']
+
+
+def migrate_to(conn, version):
+    # An older schema, as migrate() would have left it at that version
+    for number, migration in enumerate(schema.MIGRATIONS[:version], 1):
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {number}")
+    conn.commit()
+
+
+def columns(conn, table):
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def indexes(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'chart_of_accounts.db')
+
+
+@pytest.fixture
+def baseline_db(db_path):
+    conn = sqlite3.connect(db_path)
+    for statement in BASELINE_TABLES:
+        conn.execute(statement)
+    conn.executemany("INSERT INTO accounts (id, name, type, balance, created_date) VALUES (?, ?, ?, ?, ?)",
+                     [(1, 'Cash', 'Asset', 0.1 + 0.2 + 100, '2024-01-01'),
+                      (2, 'Sales', 'Income', -100.3, '01/02/24'),
+                      (3, 'Rent', 'Expense', 0.0, 'not a date')])
+    conn.executemany("INSERT INTO journal_entries (date, account_id, debit, credit) VALUES (?, ?, ?, ?)",
+                     [('2024-01-05', 1, 100.1, 0.0), ('2024-01-05', 1, 0.2, 0.0),
+                      ('2024-01-05', 2, 0.0, 100.3), ('garbage', 3, 0.0, 0.0)])
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+@pytest.fixture
+def book():
+    conn = accounting.connect(':memory:')
+    account_ids = [accounting.add_account(conn, f"{account_type} {i}", account_type, '0', '2024-01-01')
+                   for i in range(20) for account_type in accounting.ACCOUNT_TYPES]
+    for day in range(1, 29):
+        for account_id in account_ids[::7]:
+            accounting.add_journal_entry(conn, f"2024-02-{day:02d}", account_id, '1.25', '0.25')
+    yield conn
+    conn.close()
+
+
+def test_baseline_database_is_upgraded_in_place(baseline_db):
+    conn = accounting.connect(baseline_db)
+    assert schema.schema_version(conn) == len(schema.MIGRATIONS)
+
+    fresh = accounting.connect(':memory:')
+    for table in ['accounts', 'journal_entries', 'balance_snapshots', 'vouchers']:
+        assert columns(conn, table) == columns(fresh, table)
+    assert indexes(fresh) <= indexes(conn)
+
+    # Amounts become exact cents, dates YYYYMMDD codes or NULL
+    assert conn.execute("SELECT id, balance, created_date FROM accounts ORDER BY id").fetchall() == [
+        (1, 10030, 20240101), (2, -10030, 20240102), (3, 0, None)]
+    assert conn.execute("SELECT date, debit, credit FROM journal_entries ORDER BY id").fetchall() == [
+        (20240105, 10010, 0), (20240105, 20, 0), (20240105, 0, 10030), (None, 0, 0)]
+
+    # The existing balances are taken as they are
+    assert integrity.verify(conn) == []
+    assert [row[1] for row in accounting.search_accounts(conn, 'ash')] == ['Cash']
+
+
+def test_money_migration_converts_snapshots(db_path):
+    conn = sqlite3.connect(db_path)
+    migrate_to(conn, 3)
+    conn.execute("INSERT INTO accounts (id, name, type, balance, created_date) VALUES (1, 'Cash', 'Asset', 19.99, "
+                 "'2024-01-01')")
+    conn.execute("INSERT INTO journal_entries (date, account_id, debit, credit) VALUES ('2024-01-02', 1, 19.99, 0)")
+    conn.execute("INSERT INTO balance_snapshots (period_end, account_id, balance) VALUES ('2024-01-31', 1, 19.99)")
+    conn.commit()
+    conn.close()
+
+    conn = accounting.connect(db_path)
+    assert conn.execute("SELECT balance FROM accounts").fetchone() == (1999,)
+    assert conn.execute("SELECT debit FROM journal_entries").fetchone() == (1999,)
+    assert conn.execute("SELECT period_end, balance FROM balance_snapshots").fetchone() == (20240131, 1999)
+    assert accounting.get_closed_periods(conn) == ['2024-01-31']
+
+
+def test_date_migration_keeps_vouchers_and_search(db_path):
+    conn = sqlite3.connect(db_path)
+    migrate_to(conn, 6)
+    conn.execute("INSERT INTO accounts (id, name, type, balance, created_date) VALUES (1, 'Petty Cash', 'Asset', "
+                 "500, '03/15/2023')")
+    conn.execute("INSERT INTO accounts (id, name, type, balance, created_date) VALUES (2, 'Owner', 'Equity', "
+                 "-500, '2023-03-15')")
+    conn.execute("INSERT INTO vouchers (id, date, memo) VALUES (1, '2023-03-16', 'Float')")
+    conn.executemany("INSERT INTO journal_entries (date, account_id, debit, credit, voucher_id) "
+                     "VALUES ('2023-03-16', ?, ?, ?, 1)", [(1, 500, 0), (2, 0, 500)])
+    conn.commit()
+    conn.close()
+
+    conn = accounting.connect(db_path)
+    assert conn.execute("SELECT created_date FROM accounts ORDER BY id").fetchall() == [(20230315,), (20230315,)]
+    assert conn.execute("SELECT date, memo FROM vouchers").fetchall() == [(20230316, 'Float')]
+    assert accounting.get_voucher(conn, 1)[0] == (1, '2023-03-16', 'Float')
+    assert [row[1] for row in accounting.search_accounts(conn, 'etty')] == ['Petty Cash']
+
+    # The search index is kept up to date by its recreated triggers
+    accounting.add_account(conn, 'Petty Cash Branch', 'Asset', '0', '2024-01-01')
+    assert len(accounting.search_accounts(conn, 'etty')) == 2
+
+
+def test_balance_verification_migration_sets_opening_balances(db_path):
+    conn = sqlite3.connect(db_path)
+    migrate_to(conn, 8)
+    conn.execute("INSERT INTO accounts (id, name, type, balance, created_date) VALUES (1, 'Cash', 'Asset', "
+                 "1500, 20240101)")
+    conn.execute("INSERT INTO journal_entries (date, account_id, debit, credit) VALUES (20240102, 1, 1000, 0)")
+    conn.commit()
+    conn.close()
+
+    conn = accounting.connect(db_path)
+    assert conn.execute("SELECT opening_balance FROM accounts").fetchone() == (500,)
+    assert integrity.verify(conn) == []
+
+    conn.execute("UPDATE accounts SET balance = 1600")
+    conn.commit()
+    assert integrity.pending(conn) == 1
+    assert integrity.verify(conn, incremental=True) == [(1, 'Cash', 1600, 1500)]
+
+
+def test_ledger_uses_account_date_index(book):
+    query, conditions, params = accounting.ledger_query(3, '2024-02-01', '2024-02-14')
+    query += " WHERE " + " AND ".join(conditions) + " ORDER BY je.account_id, je.date, je.id"
+    plan = schema.explain_query_plan(book, query, params)
+    assert any('INDEX journal_entries_account_date (account_id=? AND date>? AND date<?)' in step for step in plan)
+    assert not any('TEMP B-TREE' in step for step in plan)
+
+
+def test_date_range_uses_date_index(book):
+    conditions, params = accounting.date_range('je.date', '2024-02-01', '2024-02-07')
+    query = "SELECT je.id, je.debit FROM journal_entries AS je WHERE " + " AND ".join(conditions)
+    plan = schema.explain_query_plan(book, query, params)
+    assert any('INDEX journal_entries_date (date>? AND date<?)' in step for step in plan)
+
+
+def test_account_type_uses_type_index(book):
+    query = "SELECT id, name, type, balance FROM accounts WHERE type = ? ORDER BY id"
+    plan = schema.explain_query_plan(book, query, ('Asset',))
+    assert plan == ['SEARCH accounts USING INDEX accounts_type (type=?)']
+    assert [row[2] for row in reports.account_balances(book, 'Asset')] == ['Asset'] * 20
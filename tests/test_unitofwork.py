@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+import accounting
+from unitofwork import GroupCommit
+
+
+@pytest.fixture
+def books(tmp_path):
+    # The writer, whose timer commits from another thread, and a reader that
+    # only sees what has been committed
+    path = str(tmp_path / 'books.db')
+    conn = accounting.connect(path, check_same_thread=False)
+    cash = accounting.add_account(conn, 'Cash', 'Asset', '0', '2024-01-01')
+    reader = accounting.connect(path)
+    yield conn, reader, cash
+    reader.close()
+    conn.close()
+
+
+def post(conn, account_id):
+    return accounting.add_journal_entry(conn, '2024-02-01', account_id, '10', '5')
+
+
+def committed(reader):
+    return reader.execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0]
+
+
+def test_timer_commits_a_burst_without_further_postings(books):
+    conn, reader, cash = books
+    group = GroupCommit(conn, flush_interval=0.05)
+    for _ in range(3):
+        group.run(post, conn, cash)
+    assert committed(reader) == 0
+
+    deadline = time.monotonic() + 5
+    while committed(reader) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert committed(reader) == 3
+    assert not conn.in_transaction
+
+
+def test_failed_posting_is_rolled_back_and_the_batch_kept(books):
+    conn, reader, cash = books
+
+    def fails(conn):
+        post(conn, cash)
+        raise ValueError("rejected")
+
+    with pytest.raises(ValueError):
+        with GroupCommit(conn, flush_interval=60) as group:
+            group.run(post, conn, cash)
+            with pytest.raises(ValueError):
+                group.run(fails, conn)
+            group.run(post, conn, cash)
+            raise ValueError("caller gives up")
+
+    assert committed(reader) == 2
+    assert reader.execute("SELECT balance FROM accounts WHERE id = ?", (cash,)).fetchone() == (1000,)
+
+
+def test_max_batch_commits_at_once(books):
+    conn, reader, cash = books
+    group = GroupCommit(conn, flush_interval=60, max_batch=2)
+    group.run(post, conn, cash)
+    assert committed(reader) == 0
+    group.run(post, conn, cash)
+    assert committed(reader) == 2
+    assert not conn.in_transaction
+
+    group.run(post, conn, cash)
+    assert committed(reader) == 2
+    group.flush()
+    assert committed(reader) == 3
@@ -0,0 +1,104 @@
+from widgets import GroupedTreeview
+
+
+class FakeTree:
+    # The few ttk.Treeview calls the paged views make
+    def __init__(self):
+        self.children = {'': []}
+        self.values = {}
+        self.inserted = 0
+        self.scrolled = 0
+
+    def configure(self, **options):
+        pass
+
+    def exists(self, iid):
+        return iid in self.values
+
+    def insert(self, parent, index, iid=None, values=(), open=False):
+        self.inserted += 1
+        iid = iid or f"I{self.inserted}"
+        self.values[iid] = tuple(values)
+        self.children[iid] = []
+        siblings = self.children[parent]
+        siblings.insert(len(siblings) if index == 'end' else index, iid)
+        return iid
+
+    def get_children(self, item=''):
+        return tuple(self.children[item])
+
+    def item(self, iid, option):
+        return self.values[iid]
+
+    def delete(self, *items):
+        for iid in items:
+            for siblings in self.children.values():
+                if iid in siblings:
+                    siblings.remove(iid)
+            for child in self.children.pop(iid):
+                self.delete(child)
+            del self.values[iid]
+
+    def yview_scroll(self, number, what):
+        self.scrolled += number
+
+
+class Executor:
+    on_error = None
+
+    def submit(self, func, on_done, key=None, error=None):
+        on_done(func(None))
+
+
+# Entries 1..8; 2-4 are voucher 10 and 6-7 voucher 11
+ROWS = [(1, ''), (2, 10), (3, 10), (4, 10), (5, ''), (6, 11), (7, 11), (8, '')]
+
+
+def fetch_page(conn, after_id=None, before_id=None, limit=3):
+    rows = [row for row in ROWS if (after_id is None or row[0] > after_id)
+            and (before_id is None or row[0] < before_id)]
+    return rows[-limit:] if before_id is not None else rows[:limit]
+
+
+def view(tree, max_pages=3):
+    return GroupedTreeview(tree, fetch_page, Executor(), 'journal', group_column=1,
+                           group_row=lambda row: ('', row[1]), page_size=3, max_pages=max_pages)
+
+
+def shown(tree, item=''):
+    return [(tree.values[iid], shown(tree, iid)) if tree.children[iid] else tree.values[iid]
+            for iid in tree.get_children(item)]
+
+
+def test_voucher_lines_are_grouped_across_pages():
+    tree = FakeTree()
+    journal = view(tree)
+    journal.reload()
+    journal.load_next()
+    journal.load_next()
+    assert shown(tree) == [(1, ''),
+                           (('', 10), [(2, 10), (3, 10), (4, 10)]),
+                           (5, ''),
+                           (('', 11), [(6, 11), (7, 11)]),
+                           (8, '')]
+    assert journal.at_end
+
+
+def test_window_drops_and_refetches_whole_groups():
+    tree = FakeTree()
+    journal = view(tree, max_pages=1)
+    journal.reload()
+    journal.load_next()
+    assert shown(tree) == [(('', 10), [(2, 10), (3, 10), (4, 10)]), (5, ''), (('', 11), [(6, 11)])]
+    assert tree.scrolled == -1
+
+    # Voucher 10 goes as a whole; the scroll follows the lines dropped
+    journal.load_next()
+    assert shown(tree) == [(5, ''), (('', 11), [(6, 11), (7, 11)]), (8, '')]
+    assert tree.scrolled == -5
+    assert journal.first_key() == 5
+
+    journal.load_previous()
+    assert shown(tree) == [(('', 10), [(2, 10), (3, 10), (4, 10)]), (5, ''), (('', 11), [(6, 11), (7, 11)])]
+    assert tree.scrolled == -1
+    assert journal.last_key() == 7
@@ -0,0 +1,101 @@
+import threading
+from contextlib import contextmanager
+
+
+# Transactions for the write paths. transaction(conn) makes a block atomic: at
+# the top level it is one BEGIN ... COMMIT, and inside an open transaction it
+# becomes a savepoint, so a failing block is undone on its own without
+# committing or rolling back the enclosing work.
+#
+# GroupCommit keeps one transaction open across many postings and commits
+# them together `flush_interval` seconds after the first of them, or once
+# `max_batch` blocks have run, so a burst of postings shares a single fsync.
+# The interval is kept by a timer thread that commits on its own when the
+# postings stop, so the write lock is never held longer than that; the
+# connection must therefore be opened with check_same_thread=False. Each
+# posting is still atomic through its savepoint. Work since the last commit is
+# lost if the process dies, so call flush() (or leave the `with` block) at
+# points that must be durable.
+
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def configure(conn, wal=True, synchronous='FULL'):
+    synchronous = synchronous.upper()
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"Invalid synchronous level {synchronous!r}")
+    if wal:
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+
+
+@contextmanager
+def transaction(conn):
+    if conn.in_transaction:
+        conn.execute("SAVEPOINT unit_of_work")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK TO unit_of_work")
+            conn.execute("RELEASE unit_of_work")
+            raise
+        conn.execute("RELEASE unit_of_work")
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+class GroupCommit:
+    def __init__(self, conn, flush_interval=0.05, max_batch=1000):
+        self.conn = conn
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.pending = 0
+        self.timer = None
+        # Held while a posting runs or the batch commits, so the timer never
+        # commits half a posting
+        self.lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A posting that failed has already been rolled back to its
+        # savepoint, so whatever is open now succeeded and is kept
+        self.flush()
+
+    @contextmanager
+    def unit(self):
+        with self.lock:
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN IMMEDIATE")
+                # Commits the batch once the interval is up, even if no
+                # further posting arrives to notice
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+            with transaction(self.conn):
+                yield self.conn
+            self.pending += 1
+            if self.pending >= self.max_batch:
+                self.flush()
+
+    def run(self, func, *args, **kwargs):
+        # Runs one posting, e.g. run(accounting.add_journal_entry, conn, ...)
+        with self.unit():
+            return func(*args, **kwargs)
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.conn.in_transaction:
+                self.conn.commit()
+            self.pending = 0
@@ -0,0 +1,205 @@
+# Windowed Treeview: only a few pages of rows are kept in the widget at once.
+# More rows are fetched with keyset pagination when the view is scrolled close
+# to either end, and pages that fall out of the window are dropped again, so
+# memory stays bounded no matter how big the table is.
+#
+# Pages are fetched on the QueryExecutor's worker thread with
+# fetch_page(conn, after_id=None, before_id=None, limit=...), which must return
+# rows in ascending key order with the key (e.g. journal_entries.id) in the
+# first column.
+class PagedTreeview:
+    def __init__(self, tree, fetch_page, executor, key, page_size=200, max_pages=3, scrollbar=None):
+        self.tree = tree
+        self.fetch_page = fetch_page
+        self.executor = executor
+        self.key = key
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.scrollbar = scrollbar
+        self.at_start = True
+        self.at_end = True
+        self.loading = False
+        tree.configure(yscrollcommand=self.on_scroll)
+
+    def request(self, on_rows, **page):
+        # Every request of this view shares one executor key, so a reload
+        # supersedes a page fetch that is still in flight
+        self.loading = True
+        self.executor.submit(lambda conn: self.fetch_page(conn, limit=self.page_size, **page),
+                             lambda rows: self.loaded(on_rows, rows), key=self.key,
+                             error=self.failed)
+
+    def loaded(self, on_rows, rows):
+        try:
+            on_rows(rows)
+        finally:
+            self.loading = False
+
+    def failed(self, error):
+        self.loading = False
+        if self.executor.on_error:
+            self.executor.on_error(error)
+
+    def reload(self):
+        self.request(self.show_first_page)
+
+    def show_first_page(self, rows):
+        self.tree.delete(*self.tree.get_children())
+        self.insert_rows(rows, 'end')
+        self.at_start = True
+        self.at_end = len(rows) < self.page_size
+
+    def show_rows(self, rows):
+        # A complete, bounded result (e.g. a search) shown instead of the
+        # pages; nothing more is fetched on scroll until the next reload
+        self.loading = False
+        self.tree.delete(*self.tree.get_children())
+        self.insert_rows(rows, 'end')
+        self.at_start = True
+        self.at_end = True
+
+    def insert_rows(self, rows, index):
+        if index == 'end':
+            for row in rows:
+                self.tree.insert('', 'end', values=row)
+        else:
+            for row in reversed(rows):
+                self.tree.insert('', 0, values=row)
+
+    def lines(self, items):
+        # Lines the items take up in the widget
+        return len(items)
+
+    def first_key(self):
+        children = self.tree.get_children()
+        return self.tree.item(children[0], 'values')[0] if children else None
+
+    def last_key(self):
+        children = self.tree.get_children()
+        return self.tree.item(children[-1], 'values')[0] if children else None
+
+    def load_next(self):
+        last_key = self.last_key()
+        if last_key is not None:
+            self.request(self.append_page, after_id=last_key)
+
+    def append_page(self, rows):
+        self.at_end = len(rows) < self.page_size
+        if not rows:
+            return
+        self.insert_rows(rows, 'end')
+
+        # Drop rows from the top, keeping the same rows in view
+        children = self.tree.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            dropped = self.lines(children[:excess])
+            self.tree.delete(*children[:excess])
+            self.tree.yview_scroll(-dropped, 'units')
+            self.at_start = False
+
+    def load_previous(self):
+        first_key = self.first_key()
+        if first_key is not None:
+            self.request(self.prepend_page, before_id=first_key)
+
+    def prepend_page(self, rows):
+        self.at_start = len(rows) < self.page_size
+        if not rows:
+            return
+        before = self.lines(self.tree.get_children())
+        self.insert_rows(rows, 0)
+        self.tree.yview_scroll(self.lines(self.tree.get_children()) - before, 'units')
+
+        # Drop rows from the bottom
+        children = self.tree.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            self.tree.delete(*children[-excess:])
+            self.at_end = False
+
+    def on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if self.loading:
+            return
+
+        if float(last) > 0.9 and not self.at_end:
+            self.load_next()
+        elif float(first) < 0.1 and not self.at_start:
+            self.load_previous()
+
+
+# PagedTreeview that shows the rows sharing a value in `group_column` under a
+# parent row, e.g. the lines of a voucher under the voucher; group_row(row)
+# gives the parent's values. Rows of a group must be adjacent in key order, as
+# voucher lines are, and a group cut by a page boundary is joined up again
+# when the page next to it arrives. Rows with an empty value stay at the top
+# level. The window still counts top-level rows.
+class GroupedTreeview(PagedTreeview):
+    def __init__(self, tree, fetch_page, executor, key, group_column, group_row, **kwargs):
+        super().__init__(tree, fetch_page, executor, key, **kwargs)
+        self.group_column = group_column
+        self.group_row = group_row
+
+    def parent(self, row, index):
+        group = row[self.group_column]
+        if group in ('', None):
+            return ''
+        iid = f"group-{group}"
+        if not self.tree.exists(iid):
+            self.tree.insert('', index, iid=iid, values=self.group_row(row), open=True)
+        return iid
+
+    def insert_rows(self, rows, index):
+        if index == 'end':
+            for row in rows:
+                self.tree.insert(self.parent(row, 'end'), 'end', values=row)
+        else:
+            for row in reversed(rows):
+                self.tree.insert(self.parent(row, 0), 0, values=row)
+
+    def lines(self, items):
+        return sum(1 + len(self.tree.get_children(item)) for item in items)
+
+    def first_key(self):
+        children = self.tree.get_children()
+        if not children:
+            return None
+        lines = self.tree.get_children(children[0])
+        return self.tree.item(lines[0] if lines else children[0], 'values')[0]
+
+    def last_key(self):
+        children = self.tree.get_children()
+        if not children:
+            return None
+        lines = self.tree.get_children(children[-1])
+        return self.tree.item(lines[-1] if lines else children[-1], 'values')[0]
+
+
+# Notebook whose tabs are filled in the first time they are selected. Each tab
+# is added as an empty frame with a build(frame) function that creates its
+# widgets and starts loading its data, so startup only pays for the tab that
+# is shown first.
+class LazyTabs:
+    def __init__(self, notebook):
+        self.notebook = notebook
+        self.builders = {}
+        notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+
+    def add(self, frame, text, build):
+        self.notebook.add(frame, text=text)
+        self.builders[str(frame)] = (frame, build)
+
+    def is_built(self, frame):
+        return str(frame) not in self.builders
+
+    def build(self, frame):
+        entry = self.builders.pop(str(frame), None)
+        if entry is not None:
+            entry[1](entry[0])
+
+    def on_tab_changed(self, event=None):
+        selected = self.notebook.select()
+        if selected:
+            self.build(selected)
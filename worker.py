@@ -0,0 +1,139 @@
+import queue
+import threading
+import time
+
+import accounting
+import instrument
+
+
+# Runs database work off the Tk thread. Jobs run one at a time on a worker
+# thread that owns its own connection; results are queued and handed to the
+# job's callback on the Tk thread by polling with root.after, since Tk must
+# only be touched from the thread running mainloop.
+#
+# Jobs submitted with a key supersede any earlier job with the same key: a
+# queued one is skipped and a running one is interrupted, and neither gets its
+# callback called. This is what keeps e.g. an old search from overwriting the
+# results of a newer one.
+
+class Job:
+    def __init__(self, func, callback, error, key, progress):
+        self.func = func
+        self.callback = callback
+        self.error = error
+        self.key = key
+        self.progress = progress
+        self.cancelled = False
+
+    def name(self):
+        return self.key or getattr(self.func, '__qualname__', 'job')
+
+
+class QueryExecutor:
+    def __init__(self, root, db_path, on_error=None, on_busy=None, poll_interval=50):
+        self.root = root
+        self.db_path = db_path
+        self.on_error = on_error
+        self.on_busy = on_busy
+        self.poll_interval = poll_interval
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.latest = {}
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.running = None
+        self.conn = None
+        self.thread = threading.Thread(target=self.run, name='query-executor', daemon=True)
+        self.thread.start()
+        self.root.after(self.poll_interval, self.poll)
+
+    def submit(self, func, callback=None, key=None, error=None, progress=None):
+        # func(conn) runs on the worker; with `progress` it is called as
+        # func(conn, report) and every report(value) reaches progress(value)
+        job = Job(func, callback, error, key, progress)
+        if key is not None:
+            self.cancel(key)
+            self.latest[key] = job
+        self.pending += 1
+        self.set_busy()
+        self.jobs.put(job)
+        return job
+
+    def cancel(self, key):
+        job = self.latest.pop(key, None)
+        if job is None:
+            return
+        with self.lock:
+            job.cancelled = True
+            if self.running is job:
+                self.conn.interrupt()
+
+    def run(self):
+        self.conn = accounting.connect(self.db_path)
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            with self.lock:
+                if job.cancelled:
+                    self.results.put(('done', job, None, None))
+                    continue
+                self.running = job
+
+            started = time.perf_counter() if instrument.enabled else None
+            try:
+                if job.progress:
+                    result = job.func(self.conn, lambda value, job=job: self.results.put(('progress', job, value, None)))
+                else:
+                    result = job.func(self.conn)
+                error = None
+            except Exception as e:
+                result = None
+                error = e
+                if self.conn.in_transaction:
+                    self.conn.rollback()
+            if started is not None:
+                instrument.record('job:' + job.name(), time.perf_counter() - started)
+
+            with self.lock:
+                self.running = None
+            self.results.put(('done', job, result, error))
+        self.conn.close()
+
+    def poll(self):
+        self.root.after(self.poll_interval, self.poll)
+        while True:
+            try:
+                kind, job, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == 'progress':
+                if not job.cancelled:
+                    job.progress(result)
+                continue
+
+            self.pending -= 1
+            if self.latest.get(job.key) is job:
+                del self.latest[job.key]
+            if job.cancelled:
+                continue
+            started = time.perf_counter() if instrument.enabled else None
+            if error is not None:
+                handler = job.error or self.on_error
+                if handler:
+                    handler(error)
+            elif job.callback:
+                job.callback(result)
+            if started is not None:
+                instrument.record('callback:' + job.name(), time.perf_counter() - started)
+
+        self.set_busy()
+
+    def set_busy(self):
+        if self.on_busy:
+            self.on_busy(self.pending)
+
+    def close(self):
+        self.jobs.put(None)
+        self.thread.join()